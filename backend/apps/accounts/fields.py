@@ -0,0 +1,60 @@
+"""
+Custom Model Fields for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from django.db import models
+
+
+class ScaledDecimalField(models.DecimalField):
+    """
+    Decimal amount stored as a scaled 64-bit integer.
+
+    The column holds ``value * 10**decimal_places`` as BIGINT, so rows stay
+    narrow and the database does native integer arithmetic. Python code,
+    filters, aggregates and serializers still see ``Decimal`` values.
+    The default ``max_digits=18`` keeps every valid value inside int64.
+    """
+    def __init__(self, *args, max_digits=18, decimal_places=8, **kwargs):
+        super().__init__(*args, max_digits=max_digits, decimal_places=decimal_places, **kwargs)
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def to_units(self, value):
+        """Convert a decimal amount to integer minor units."""
+        value = self.to_python(value)
+        return int(value.scaleb(self.decimal_places).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(value).scaleb(-self.decimal_places)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None or hasattr(value, 'as_sql'):
+            return value
+        return self.to_units(value)
+
+    def get_db_prep_save(self, value, connection):
+        if hasattr(value, 'as_sql'):
+            return value
+        return self.get_db_prep_value(value, connection)
+
+
+class CodedChoices(models.IntegerChoices):
+    """
+    Integer choices with a stable string code for the API layer.
+
+    The database stores the small integer value; ``code`` is what clients
+    send and receive. Codes default to the lowercased member name.
+    """
+    @property
+    def code(self):
+        return self.name.lower()
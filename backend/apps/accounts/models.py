@@ -12,16 +12,49 @@ Supports both traditional banking and Web3 wallet integration.
 """
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, connections, models
+from django.db.models import Q
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
 from django.core.validators import RegexValidator
-import uuid
 from decimal import Decimal
+from enum import IntFlag
+from .fields import CodedChoices, ScaledDecimalField
+from .utils import random_digits, uuid7
+
+class KYCStatus(CodedChoices):
+    PENDING = 0, 'Pending'
+    VERIFIED = 1, 'Verified'
+    REJECTED = 2, 'Rejected'
+    EXPIRED = 3, 'Expired'
+
+class AccountType(CodedChoices):
+    CHECKING = 0, 'Checking'
+    SAVINGS = 1, 'Savings'
+    INVESTMENT = 2, 'Investment'
+    CRYPTO = 3, 'Cryptocurrency'
+    BUSINESS = 4, 'Business'
+
+class Currency(CodedChoices):
+    USD = 0, 'US Dollar'
+    EUR = 1, 'Euro'
+    GBP = 2, 'British Pound'
+    ETH = 3, 'Ethereum'
+    BTC = 4, 'Bitcoin'
+    USDC = 5, 'USD Coin'
+    USDT = 6, 'Tether'
+    
+    @property
+    def code(self):
+        return self.name
 
 class User(AbstractUser):
     """
     Extended user model with fintech-specific fields and Web3 integration.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     
@@ -30,16 +63,7 @@ class User(AbstractUser):
     is_wallet_verified = models.BooleanField(default=False)
     
     # KYC/AML Compliance
-    kyc_status = models.CharField(
-        max_length=20,
-        choices=[
-            ('pending', 'Pending'),
-            ('verified', 'Verified'),
-            ('rejected', 'Rejected'),
-            ('expired', 'Expired'),
-        ],
-        default='pending'
-    )
+    kyc_status = models.PositiveSmallIntegerField(choices=KYCStatus.choices, default=KYCStatus.PENDING)
     kyc_verified_at = models.DateTimeField(null=True, blank=True)
     
     # Profile Information
@@ -67,48 +91,46 @@ class User(AbstractUser):
     class Meta:
         db_table = 'users'
         indexes = [
-            models.Index(fields=['wallet_address']),
-            models.Index(fields=['email']),
             models.Index(fields=['kyc_status']),
         ]
     
+    def save(self, *args, **kwargs):
+        # Canonicalise once at ingress so address lookups never need lower()
+        if self.wallet_address:
+            self.wallet_address = self.wallet_address.lower()
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.email} ({self.wallet_address or 'No Wallet'})"
 
+class AccountQuerySet(models.QuerySet):
+    """
+    Account queryset that keeps bulk inserts consistent with save().
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        """Assign account numbers before inserting, since bulk_create() skips save()."""
+        objs = list(objs)
+        for account in objs:
+            if not account.account_number:
+                account.account_number = account.generate_account_number()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class Account(models.Model):
     """
     Banking account model supporting multiple currencies and account types.
     """
-    ACCOUNT_TYPES = [
-        ('checking', 'Checking'),
-        ('savings', 'Savings'),
-        ('investment', 'Investment'),
-        ('crypto', 'Cryptocurrency'),
-        ('business', 'Business'),
-    ]
-    
-    CURRENCY_CHOICES = [
-        ('USD', 'US Dollar'),
-        ('EUR', 'Euro'),
-        ('GBP', 'British Pound'),
-        ('ETH', 'Ethereum'),
-        ('BTC', 'Bitcoin'),
-        ('USDC', 'USD Coin'),
-        ('USDT', 'Tether'),
-    ]
-    
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accounts')
     
     # Account Details
     account_number = models.CharField(max_length=20, unique=True)
-    account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
-    currency = models.CharField(max_length=10, choices=CURRENCY_CHOICES, default='USD')
+    account_type = models.PositiveSmallIntegerField(choices=AccountType.choices)
+    currency = models.PositiveSmallIntegerField(choices=Currency.choices, default=Currency.USD)
     
-    # Balances
-    available_balance = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('0'))
-    ledger_balance = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('0'))
-    pending_balance = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('0'))
+    # Balances (stored as BIGINT units of 10^-8)
+    available_balance = ScaledDecimalField(default=Decimal('0'))
+    ledger_balance = ScaledDecimalField(default=Decimal('0'))
+    pending_balance = ScaledDecimalField(default=Decimal('0'))
     
     # Account Status
     is_active = models.BooleanField(default=True)
@@ -129,17 +151,22 @@ class Account(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_transaction_at = models.DateTimeField(null=True, blank=True)
     
+    objects = AccountQuerySet.as_manager()
+    
     class Meta:
         db_table = 'accounts'
         unique_together = [['user', 'account_type', 'currency']]
         indexes = [
-            models.Index(fields=['account_number']),
-            models.Index(fields=['user', 'is_active']),
+            models.Index(
+                fields=['user'],
+                condition=Q(is_active=True, is_frozen=False),
+                name='acct_user_active_pidx',
+            ),
             models.Index(fields=['currency', 'account_type']),
         ]
     
     def __str__(self):
-        return f"{self.user.email} - {self.account_type.title()} ({self.currency})"
+        return f"{self.user.email} - {self.get_account_type_display()} ({Currency(self.currency).code})"
     
     def save(self, *args, **kwargs):
         if not self.account_number:
@@ -148,19 +175,15 @@ class Account(models.Model):
     
     def generate_account_number(self):
         """Generate a unique account number."""
-        import random
-        import string
-        
         prefix = {
-            'checking': '101',
-            'savings': '201',
-            'investment': '301',
-            'crypto': '401',
-            'business': '501',
+            AccountType.CHECKING: '101',
+            AccountType.SAVINGS: '201',
+            AccountType.INVESTMENT: '301',
+            AccountType.CRYPTO: '401',
+            AccountType.BUSINESS: '501',
         }.get(self.account_type, '999')
         
-        suffix = ''.join(random.choices(string.digits, k=10))
-        return f"{prefix}{suffix}"
+        return f"{prefix}{random_digits(10)}"
 
 class AccountLimit(models.Model):
     """
@@ -196,6 +219,30 @@ class AccountLimit(models.Model):
     def is_limit_exceeded(self):
         return self.used_amount >= self.limit_amount
 
+class NotifyFlag(IntFlag):
+    """
+    Bits of UserPreference.notification_flags.
+    """
+    EMAIL = 1 << 0
+    SMS = 1 << 1
+    PUSH = 1 << 2
+    TRANSACTION = 1 << 3
+    SECURITY = 1 << 4
+    MARKETING = 1 << 5
+
+def _notify_flag_property(flag):
+    """Expose a single notification bit as a boolean attribute."""
+    def getter(self):
+        return bool(self.notification_flags & flag)
+    
+    def setter(self, enabled):
+        if enabled:
+            self.notification_flags = int(self.notification_flags) | int(flag)
+        else:
+            self.notification_flags = int(self.notification_flags) & ~int(flag)
+    
+    return property(getter, setter)
+
 class UserPreference(models.Model):
     """
     User preferences and settings for personalization.
@@ -207,18 +254,21 @@ class UserPreference(models.Model):
     language = models.CharField(max_length=10, default='en')
     currency_display = models.CharField(max_length=10, default='USD')
     
-    # Notification Preferences
-    email_notifications = models.BooleanField(default=True)
-    sms_notifications = models.BooleanField(default=False)
-    push_notifications = models.BooleanField(default=True)
-    transaction_alerts = models.BooleanField(default=True)
-    security_alerts = models.BooleanField(default=True)
-    marketing_emails = models.BooleanField(default=False)
+    # Notification Preferences (bitmask of NotifyFlag)
+    notification_flags = models.PositiveIntegerField(
+        default=int(NotifyFlag.EMAIL | NotifyFlag.PUSH | NotifyFlag.TRANSACTION | NotifyFlag.SECURITY)
+    )
+    email_notifications = _notify_flag_property(NotifyFlag.EMAIL)
+    sms_notifications = _notify_flag_property(NotifyFlag.SMS)
+    push_notifications = _notify_flag_property(NotifyFlag.PUSH)
+    transaction_alerts = _notify_flag_property(NotifyFlag.TRANSACTION)
+    security_alerts = _notify_flag_property(NotifyFlag.SECURITY)
+    marketing_emails = _notify_flag_property(NotifyFlag.MARKETING)
     
     # Security Preferences
     require_2fa_for_transfers = models.BooleanField(default=False)
     auto_logout_minutes = models.IntegerField(default=30)
-    ip_whitelist = models.JSONField(default=list, blank=True)
+    ip_whitelist = ArrayField(models.GenericIPAddressField(), default=list, blank=True)
     
     # Trading Preferences
     default_slippage = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.5'))
@@ -229,4 +279,61 @@ class UserPreference(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        db_table = 'user_preferences'
\ No newline at end of file
+        db_table = 'user_preferences'
+        indexes = [
+            GinIndex(fields=['ip_whitelist'], name='userpref_ip_whitelist_gin'),
+        ]
+
+# Created by the post_migrate hook below; the unique index is required for
+# REFRESH MATERIALIZED VIEW CONCURRENTLY. The view reads accounts.user_id,
+# currency and available_balance, so any migration altering those columns
+# must run DROP_USER_BALANCE_SUMMARY_SQL first (RunSQL at the top of its
+# operations); post_migrate recreates the view once the migration finishes.
+USER_BALANCE_SUMMARY_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_balance_summary AS
+    SELECT user_id,
+           COUNT(*) AS total_accounts,
+           SUM(available_balance) FILTER (WHERE currency = {usd}) AS total_balance_usd
+    FROM accounts
+    GROUP BY user_id;
+CREATE UNIQUE INDEX IF NOT EXISTS user_balance_summary_user_id
+    ON user_balance_summary (user_id);
+""".format(usd=int(Currency.USD))
+DROP_USER_BALANCE_SUMMARY_SQL = 'DROP MATERIALIZED VIEW IF EXISTS user_balance_summary'
+
+class UserBalanceSummary(models.Model):
+    """
+    Per-user account aggregates read from the user_balance_summary
+    materialized view. Refreshed periodically, so values are eventually
+    consistent with the accounts table.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='balance_summary'
+    )
+    total_accounts = models.IntegerField()
+    total_balance_usd = ScaledDecimalField(null=True)
+    
+    class Meta:
+        managed = False
+        db_table = 'user_balance_summary'
+    
+    @classmethod
+    def refresh(cls):
+        """Recompute the view without blocking concurrent reads."""
+        with connection.cursor() as cursor:
+            cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY user_balance_summary')
+
+@receiver(post_migrate)
+def create_user_balance_summary(sender, using, **kwargs):
+    """
+    Create the user_balance_summary view and its unique index once the
+    accounts tables exist. The DDL is idempotent, so this is safe on every
+    migrate run.
+    """
+    if sender.label != 'accounts':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(USER_BALANCE_SUMMARY_SQL)
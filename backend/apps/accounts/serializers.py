@@ -12,9 +12,101 @@ Serializers for user accounts and Web3 authentication.
 
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, Account, AccountLimit, UserPreference
+from django.db.models import Count, Q
+from eth_account import Account as EthAccount
+from eth_account.messages import encode_defunct
+from .models import User, Account, AccountLimit, UserPreference, UserBalanceSummary, KYCStatus, AccountType, Currency
+import copy
 import re
 
+_ETH_ADDR_RE = re.compile(r'^0x[a-fA-F0-9]{40}\Z')
+
+class CachedFieldsMixin:
+    """
+    Builds a ModelSerializer's fields once per class.
+    
+    get_fields() introspects the model on every instantiation although the
+    result only depends on the class; it is memoised here and each instance
+    binds its own shallow copies.
+    """
+    _fields_cache = {}
+    
+    def get_fields(self):
+        cls = type(self)
+        fields = CachedFieldsMixin._fields_cache.get(cls)
+        if fields is None:
+            fields = CachedFieldsMixin._fields_cache[cls] = super().get_fields()
+        return {name: copy.copy(field) for name, field in fields.items()}
+
+class PlainDictMixin:
+    """
+    Represents instances as plain dicts rather than OrderedDicts, and returns
+    them from .data without the ReturnDict wrapper; JSON output does not need
+    either, and plain dicts pickle smaller in the cache. Pair with
+    PlainListSerializer as Meta.list_serializer_class for many=True.
+    """
+    def to_representation(self, instance):
+        return dict(super().to_representation(instance))
+    
+    @property
+    def data(self):
+        # BaseSerializer.data builds and memoises the representation;
+        # Serializer.data would only copy it into a ReturnDict
+        return serializers.BaseSerializer.data.fget(self)
+
+class PlainListSerializer(serializers.ListSerializer):
+    """many=True wrapper whose data is a plain list of dicts."""
+    @property
+    def data(self):
+        # Skip ListSerializer.data's ReturnList copy
+        return serializers.BaseSerializer.data.fget(self)
+
+class ChoiceCodeField(serializers.ChoiceField):
+    """
+    Exposes an integer choices column through its string codes, so the API
+    keeps accepting and returning values like 'checking' or 'USD'.
+    """
+    def __init__(self, choices_enum, **kwargs):
+        self.choices_enum = choices_enum
+        self.members_by_code = {member.code: member for member in choices_enum}
+        super().__init__(choices=[(member.code, member.label) for member in choices_enum], **kwargs)
+    
+    def to_internal_value(self, data):
+        return self.members_by_code[super().to_internal_value(data)]
+    
+    def to_representation(self, value):
+        return self.choices_enum(value).code
+
+def recover_wallet_address(message, signature):
+    """Recover the lowercase address that signed an EIP-191 text message."""
+    return EthAccount.recover_message(encode_defunct(text=message), signature=signature).lower()
+
+def verify_wallet_login(wallet_address, signature, message):
+    """
+    Authenticate a wallet login without constructing DRF serializers.
+    
+    Returns the active user that owns the wallet, or raises ValidationError.
+    """
+    if not _ETH_ADDR_RE.match(wallet_address):
+        raise serializers.ValidationError("Invalid Ethereum address format")
+    wallet_address = wallet_address.lower()
+    
+    try:
+        recovered_address = recover_wallet_address(message, signature)
+    except Exception as e:
+        raise serializers.ValidationError(f"Signature verification error: {str(e)}")
+    
+    if recovered_address != wallet_address:
+        raise serializers.ValidationError("Signature verification failed")
+    
+    try:
+        user = User.objects.get(wallet_address=wallet_address)
+    except User.DoesNotExist:
+        raise serializers.ValidationError("Wallet not registered")
+    if not user.is_active:
+        raise serializers.ValidationError("User account is disabled")
+    return user
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """
     Serializer for user registration with wallet integration.
@@ -42,7 +134,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         # Validate wallet address format if provided
         wallet_address = attrs.get('wallet_address')
         if wallet_address:
-            if not re.match(r'^0x[a-fA-F0-9]{40}$', wallet_address):
+            if not _ETH_ADDR_RE.match(wallet_address):
                 raise serializers.ValidationError("Invalid wallet address format")
         
         return attrs
@@ -65,9 +157,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer for user profile information.
+    
+    total_accounts and total_balance_usd come from the user_balance_summary
+    view; build querysets with setup_eager_loading() to join it.
     """
-    total_accounts = serializers.IntegerField(read_only=True)
-    total_balance_usd = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    kyc_status = ChoiceCodeField(KYCStatus, read_only=True)
+    total_accounts = serializers.SerializerMethodField()
+    total_balance_usd = serializers.DecimalField(
+        source='balance_summary.total_balance_usd', max_digits=15, decimal_places=2,
+        read_only=True, default=None
+    )
     
     class Meta:
         model = User
@@ -82,11 +181,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'id', 'email', 'wallet_address', 'is_wallet_verified', 
             'kyc_status', 'kyc_verified_at', 'is_premium', 'created_at', 'last_login'
         ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the preferences row and balance summary in the same query."""
+        return queryset.select_related('preferences', 'balance_summary')
+    
+    def get_total_accounts(self, obj):
+        """Account count from the summary view; 0 until the user has a row."""
+        try:
+            return obj.balance_summary.total_accounts
+        except UserBalanceSummary.DoesNotExist:
+            return 0
 
 class AccountSerializer(serializers.ModelSerializer):
     """
     Serializer for bank accounts with calculated fields.
     """
+    account_type = ChoiceCodeField(AccountType)
+    currency = ChoiceCodeField(Currency, required=False)
     total_balance = serializers.DecimalField(max_digits=20, decimal_places=8, read_only=True)
     balance_usd = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     account_age_days = serializers.IntegerField(read_only=True)
@@ -110,6 +223,9 @@ class AccountCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating new accounts.
     """
+    account_type = ChoiceCodeField(AccountType)
+    currency = ChoiceCodeField(Currency)
+    
     class Meta:
         model = Account
         fields = ['account_type', 'currency']
@@ -120,18 +236,20 @@ class AccountCreateSerializer(serializers.ModelSerializer):
         account_type = attrs['account_type']
         currency = attrs['currency']
         
+        # Duplicate check and per-user account count in a single query
+        counts = user.accounts.aggregate(
+            total=Count('id'),
+            duplicates=Count('id', filter=Q(account_type=account_type, currency=currency)),
+        )
+        
         # Check if user already has this type of account in this currency
-        if Account.objects.filter(
-            user=user, 
-            account_type=account_type, 
-            currency=currency
-        ).exists():
+        if counts['duplicates']:
             raise serializers.ValidationError(
-                f"You already have a {account_type} account in {currency}"
+                f"You already have a {account_type.code} account in {currency.code}"
             )
         
         # Limit number of accounts per user
-        if user.accounts.count() >= 10:
+        if counts['total'] >= 10:
             raise serializers.ValidationError("Maximum number of accounts reached")
         
         return attrs
@@ -160,6 +278,14 @@ class UserPreferenceSerializer(serializers.ModelSerializer):
     """
     Serializer for user preferences and settings.
     """
+    # Backed by bits of UserPreference.notification_flags
+    email_notifications = serializers.BooleanField(required=False)
+    sms_notifications = serializers.BooleanField(required=False)
+    push_notifications = serializers.BooleanField(required=False)
+    transaction_alerts = serializers.BooleanField(required=False)
+    security_alerts = serializers.BooleanField(required=False)
+    marketing_emails = serializers.BooleanField(required=False)
+    
     class Meta:
         model = UserPreference
         fields = [
@@ -182,35 +308,20 @@ class WalletConnectionSerializer(serializers.Serializer):
     
     def validate_wallet_address(self, value):
         """Validate Ethereum address format."""
-        if not re.match(r'^0x[a-fA-F0-9]{40}$', value):
+        if not _ETH_ADDR_RE.match(value):
             raise serializers.ValidationError("Invalid Ethereum address format")
         return value.lower()
     
     def validate(self, attrs):
         """Verify the wallet signature."""
-        from web3 import Web3
-        from eth_account.messages import encode_defunct
-        
         try:
-            message = attrs['message']
-            signature = attrs['signature']
-            wallet_address = attrs['wallet_address']
-            
-            # Create message hash
-            message_hash = encode_defunct(text=message)
-            
-            # Recover address from signature
-            recovered_address = Web3().eth.account.recover_message(
-                message_hash, 
-                signature=signature
-            ).lower()
-            
-            if recovered_address != wallet_address:
-                raise serializers.ValidationError("Signature verification failed")
-            
+            recovered_address = recover_wallet_address(attrs['message'], attrs['signature'])
         except Exception as e:
             raise serializers.ValidationError(f"Signature verification error: {str(e)}")
         
+        if recovered_address != attrs['wallet_address']:
+            raise serializers.ValidationError("Signature verification failed")
+        
         return attrs
 
 class LoginSerializer(serializers.Serializer):
@@ -245,16 +356,7 @@ class LoginSerializer(serializers.Serializer):
             
         elif wallet_address and signature and message:
             # Wallet authentication
-            wallet_serializer = WalletConnectionSerializer(data=attrs)
-            wallet_serializer.is_valid(raise_exception=True)
-            
-            try:
-                user = User.objects.get(wallet_address=wallet_address.lower())
-                if not user.is_active:
-                    raise serializers.ValidationError("User account is disabled")
-                attrs['user'] = user
-            except User.DoesNotExist:
-                raise serializers.ValidationError("Wallet not registered")
+            attrs['user'] = verify_wallet_login(wallet_address, signature, message)
         else:
             raise serializers.ValidationError("Either email/password or wallet credentials required")
         
@@ -0,0 +1,15 @@
+"""
+Account Background Tasks for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+from celery import shared_task
+from .models import UserBalanceSummary
+
+@shared_task
+def refresh_user_balance_summary():
+    """Refresh the per-user balance materialized view."""
+    UserBalanceSummary.refresh()
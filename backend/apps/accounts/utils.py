@@ -0,0 +1,131 @@
+"""
+Shared Utilities for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+import functools
+import hashlib
+import json
+import os
+import secrets
+import time
+import uuid
+from django.core.cache import cache
+from django.db import transaction as db_tx
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_TTL = 24 * 3600  # seconds
+
+# Maps every byte below 250 to an ASCII digit; 250-255 are dropped so the
+# modulo stays unbiased.
+_DIGIT_TABLE = bytes(48 + b % 10 for b in range(256))
+_DIGIT_OVERFLOW = bytes(range(250, 256))
+
+
+def uuid7():
+    """
+    Generate a time-ordered UUIDv7 (RFC 9562).
+
+    The leading 48 bits hold the Unix timestamp in milliseconds, so new
+    primary keys land on the right-hand edge of the B-tree index.
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+
+    value = (unix_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76                                # version
+    value |= (rand >> 62 & 0xFFF) << 64               # rand_a
+    value |= 0b10 << 62                               # variant
+    value |= rand & 0x3FFFFFFFFFFFFFFF                # rand_b
+    return uuid.UUID(int=value)
+
+
+def random_digits(k):
+    """
+    Return ``k`` cryptographically random decimal digits as a string.
+
+    Draws one block of random bytes and maps it to digits with a single
+    ``bytes.translate`` call instead of ``k`` separate PRNG calls.
+    """
+    digits = b''
+    while len(digits) < k:
+        digits += secrets.token_bytes(k + 4).translate(_DIGIT_TABLE, _DIGIT_OVERFLOW)
+    return digits[:k].decode('ascii')
+
+
+def cache_generation(namespace):
+    """
+    Current generation of a cache namespace.
+
+    Keys built with the generation are all invalidated at once by
+    bump_cache_generation(), without needing pattern deletes.
+    """
+    return cache.get_or_set(f"{namespace}:gen", 0, timeout=None)
+
+
+def bump_cache_generation(namespace):
+    """Invalidate every cached entry keyed on the namespace's generation."""
+    try:
+        cache.incr(f"{namespace}:gen")
+    except ValueError:
+        cache.set(f"{namespace}:gen", 1, timeout=None)
+
+
+def _request_fingerprint(request):
+    """Digest of what a request targets and carries."""
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method}:{request.path}:{payload}".encode()).hexdigest()
+
+def idempotent(view_method):
+    """
+    Make a mutating viewset action safe to retry.
+
+    A request carrying an ``Idempotency-Key`` header runs the action once,
+    atomically; the successful response is cached per user and key and
+    replayed for retries. A retry that arrives while the first request
+    is still running gets a 409 instead of executing twice, and reusing a
+    key for a different target or payload gets a 422.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        
+        cache_key = f"idem:{request.user.id}:{key}"
+        fingerprint = _request_fingerprint(request)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            cached_fingerprint, data, status_code = cached
+            if cached_fingerprint != fingerprint:
+                return Response({
+                    'error': {
+                        'code': 'IDEMPOTENCY_KEY_REUSED',
+                        'message': 'This Idempotency-Key was already used for a different request'
+                    }
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return Response(data, status=status_code)
+        
+        lock_key = f"{cache_key}:lock"
+        if not cache.add(lock_key, 1, timeout=60):
+            return Response({
+                'error': {
+                    'code': 'REQUEST_IN_PROGRESS',
+                    'message': 'A request with this Idempotency-Key is already being processed'
+                }
+            }, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            with db_tx.atomic():
+                response = view_method(self, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                cache.set(cache_key, (fingerprint, response.data, response.status_code), IDEMPOTENCY_TTL)
+        finally:
+            cache.delete(lock_key)
+        return response
+    
+    return wrapper
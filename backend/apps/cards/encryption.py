@@ -0,0 +1,39 @@
+"""
+Card Data Encryption for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+import hashlib
+import hmac
+import os
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+
+NONCE_SIZE = 12
+
+def _cipher():
+    """AES-256-GCM keyed from settings.ENCRYPTION_KEY."""
+    key = hashlib.sha256(settings.ENCRYPTION_KEY.encode('utf-8')).digest()
+    return AESGCM(key)
+
+def encrypt_value(plaintext):
+    """Encrypt a string; returns nonce + ciphertext + tag."""
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + _cipher().encrypt(nonce, plaintext.encode('utf-8'), None)
+
+def decrypt_value(blob):
+    """Decrypt a value produced by encrypt_value()."""
+    blob = bytes(blob)
+    return _cipher().decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], None).decode('utf-8')
+
+def hash_value(plaintext):
+    """
+    Deterministic keyed digest (HMAC-SHA256) of a string, hex encoded.
+    Lets encrypted values be checked for uniqueness without decrypting.
+    """
+    return hmac.new(
+        settings.ENCRYPTION_KEY.encode('utf-8'), plaintext.encode('utf-8'), hashlib.sha256
+    ).hexdigest()
@@ -6,46 +6,119 @@ Card Models for FinTech Banking Platform
 @license Commercial License - Proprietary Software
 @created 2024-01-20
 """
-from django.db import models
+from django.db import IntegrityError, models
+from django.db import transaction as db_tx
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from decimal import Decimal
-import uuid
-import random
-import string
+from apps.accounts.fields import CodedChoices
+from apps.accounts.utils import bump_cache_generation, random_digits, uuid7
+from .encryption import encrypt_value, hash_value
+
+# Luhn doubling step as a byte table: '0'-'9' -> digit sum of 2*d.
+_LUHN_DOUBLE = bytes.maketrans(b'0123456789', b'0246813579')
+
+CARD_BIN = "4532"  # Visa test BIN
+CARD_NUMBER_ATTEMPTS = 3  # draws before a PAN collision is raised
+
+def luhn_check_digit(partial_number):
+    """Calculate the Luhn check digit for a string of digits."""
+    digits = partial_number.encode('ascii')
+    # The check digit is appended on the right, so the rightmost digit
+    # of the partial number is the first one to be doubled.
+    doubled = digits[-1::-2].translate(_LUHN_DOUBLE)
+    checksum = sum(doubled) + sum(digits[-2::-2]) - 48 * len(digits)
+    return -checksum % 10
+
+def format_card_number(partial_number):
+    """Append the Luhn check digit and group the PAN in blocks of four."""
+    full_number = f"{partial_number}{luhn_check_digit(partial_number)}"
+    return f"{full_number[:4]} {full_number[4:8]} {full_number[8:12]} {full_number[12:]}"
+
+def generate_card_numbers(count):
+    """Generate ``count`` formatted card numbers from a single random draw."""
+    identifiers = random_digits(11 * count)
+    return [
+        format_card_number(CARD_BIN + identifiers[i:i + 11])
+        for i in range(0, 11 * count, 11)
+    ]
+
+class CardType(CodedChoices):
+    PHYSICAL = 0, 'Physical Card'
+    VIRTUAL = 1, 'Virtual Card'
+    VIRTUAL_SINGLE_USE = 2, 'Single-Use Virtual Card'
+    VIRTUAL_MERCHANT_LOCKED = 3, 'Merchant-Locked Virtual Card'
+    VIRTUAL_SUBSCRIPTION = 4, 'Subscription Virtual Card'
+
+class CardStatus(CodedChoices):
+    ACTIVE = 0, 'Active'
+    INACTIVE = 1, 'Inactive'
+    BLOCKED = 2, 'Blocked'
+    EXPIRED = 3, 'Expired'
+    CANCELLED = 4, 'Cancelled'
+
+VIRTUAL_CARD_TYPES = frozenset({
+    CardType.VIRTUAL,
+    CardType.VIRTUAL_SINGLE_USE,
+    CardType.VIRTUAL_MERCHANT_LOCKED,
+    CardType.VIRTUAL_SUBSCRIPTION,
+})
+
+class CardQuerySet(models.QuerySet):
+    """
+    Card queryset that keeps bulk inserts consistent with save().
+    """
+    def bulk_create(self, objs, batch_size=1000, **kwargs):
+        """
+        Assign card numbers and CVVs before inserting, since bulk_create()
+        skips save(). Numbers for the whole batch come from one random draw,
+        redrawn if the batch hits the unique card_number_hash.
+        """
+        objs = list(objs)
+        missing_numbers = [card for card in objs if not card.last4]
+        
+        missing_cvvs = [card for card in objs if not card.cvv]
+        cvv_digits = random_digits(3 * len(missing_cvvs))
+        for i, card in enumerate(missing_cvvs):
+            card.cvv = cvv_digits[3 * i:3 * i + 3]
+        
+        for attempt in range(CARD_NUMBER_ATTEMPTS):
+            for card, number in zip(missing_numbers, generate_card_numbers(len(missing_numbers))):
+                card.set_card_number(number)
+            try:
+                with db_tx.atomic():
+                    return super().bulk_create(objs, batch_size=batch_size, **kwargs)
+            except IntegrityError:
+                if not missing_numbers or attempt == CARD_NUMBER_ATTEMPTS - 1:
+                    raise
+
+class CardManager(models.Manager.from_queryset(CardQuerySet)):
+    """
+    Default card manager; leaves the encrypted PAN/CVV out of SELECTs.
+    Use Card.objects_with_secrets where the ciphertext is actually needed.
+    """
+    def get_queryset(self):
+        return super().get_queryset().defer('card_number_encrypted', 'cvv_encrypted')
 
 class Card(models.Model):
     """
     Physical and virtual card management.
     """
-    CARD_TYPES = [
-        ('physical', 'Physical Card'),
-        ('virtual', 'Virtual Card'),
-        ('virtual_single_use', 'Single-Use Virtual Card'),
-        ('virtual_merchant_locked', 'Merchant-Locked Virtual Card'),
-        ('virtual_subscription', 'Subscription Virtual Card'),
-    ]
-    
-    CARD_STATUS = [
-        ('active', 'Active'),
-        ('inactive', 'Inactive'),
-        ('blocked', 'Blocked'),
-        ('expired', 'Expired'),
-        ('cancelled', 'Cancelled'),
-    ]
-    
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     account = models.ForeignKey('accounts.Account', on_delete=models.CASCADE, related_name='cards')
     
     # Card details
-    card_number = models.CharField(max_length=19, unique=True)  # Formatted: 1234 5678 9012 3456
-    card_number_encrypted = models.TextField()  # Encrypted storage
+    last4 = models.CharField(max_length=4, db_index=True)
+    card_number_encrypted = models.BinaryField(max_length=64)  # AES-GCM nonce + ciphertext + tag
+    card_number_hash = models.CharField(max_length=64, unique=True)  # HMAC-SHA256 of the PAN
     expiry_month = models.IntegerField()
     expiry_year = models.IntegerField()
     cvv = models.CharField(max_length=4)
-    cvv_encrypted = models.TextField()  # Encrypted storage
+    cvv_encrypted = models.BinaryField(max_length=32)  # AES-GCM nonce + ciphertext + tag
     
     # Card metadata
-    card_type = models.CharField(max_length=30, choices=CARD_TYPES)
-    status = models.CharField(max_length=20, choices=CARD_STATUS, default='active')
+    card_type = models.PositiveSmallIntegerField(choices=CardType.choices)
+    status = models.PositiveSmallIntegerField(choices=CardStatus.choices, default=CardStatus.ACTIVE)
     nickname = models.CharField(max_length=100, blank=True)
     
     # Virtual card specific
@@ -66,58 +139,63 @@ class Card(models.Model):
     last_used_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)  # For temporary virtual cards
     
+    objects = CardManager()
+    objects_with_secrets = CardQuerySet.as_manager()
+    
     class Meta:
         db_table = 'cards'
         indexes = [
             models.Index(fields=['account', 'status']),
             models.Index(fields=['card_type', 'status']),
+            models.Index(
+                fields=['account'],
+                condition=models.Q(status=CardStatus.ACTIVE),
+                name='card_acct_active_pidx',
+            ),
         ]
     
     def __str__(self):
-        return f"{self.nickname or self.card_type.title()} - {self.card_number[-4:]}"
+        return f"{self.nickname or self.get_card_type_display()} - {self.last4}"
     
     def save(self, *args, **kwargs):
-        if not self.card_number:
-            self.card_number = self.generate_card_number()
         if not self.cvv:
             self.cvv = self.generate_cvv()
-        super().save(*args, **kwargs)
+        if self.last4:
+            super().save(*args, **kwargs)
+            return
+        
+        # Redraw the generated PAN if it collides with an issued one
+        for attempt in range(CARD_NUMBER_ATTEMPTS):
+            self.set_card_number(self.generate_card_number())
+            try:
+                with db_tx.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt == CARD_NUMBER_ATTEMPTS - 1:
+                    raise
+    
+    def set_card_number(self, card_number):
+        """
+        Store the PAN encrypted; only the last four digits stay in cleartext.
+        The keyed hash enforces uniqueness without exposing the number.
+        """
+        digits = card_number.replace(' ', '')
+        self.card_number_encrypted = encrypt_value(digits)
+        self.card_number_hash = hash_value(digits)
+        self.last4 = digits[-4:]
     
     def generate_card_number(self):
         """Generate a valid card number using Luhn algorithm."""
-        # Start with BIN (Bank Identification Number)
-        bin_number = "4532"  # Visa test BIN
-        
-        # Generate random digits
-        account_identifier = ''.join(random.choices(string.digits, k=11))
-        
-        # Calculate check digit using Luhn algorithm
-        partial_number = bin_number + account_identifier
-        check_digit = self.calculate_luhn_check_digit(partial_number)
-        
-        full_number = partial_number + str(check_digit)
-        
-        # Format with spaces
-        return f"{full_number[:4]} {full_number[4:8]} {full_number[8:12]} {full_number[12:]}"
+        return generate_card_numbers(1)[0]
     
     def generate_cvv(self):
         """Generate random CVV."""
-        return ''.join(random.choices(string.digits, k=3))
+        return random_digits(3)
     
     def calculate_luhn_check_digit(self, partial_number):
         """Calculate Luhn check digit."""
-        def luhn_checksum(card_num):
-            def digits_of(n):
-                return [int(d) for d in str(n)]
-            digits = digits_of(card_num)
-            odd_digits = digits[-1::-2]
-            even_digits = digits[-2::-2]
-            checksum = sum(odd_digits)
-            for d in even_digits:
-                checksum += sum(digits_of(d*2))
-            return checksum % 10
-        
-        return (10 - luhn_checksum(int(partial_number))) % 10
+        return luhn_check_digit(partial_number)
     
     @property
     def remaining_limit(self):
@@ -152,4 +230,16 @@ class CardTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        db_table = 'card_transactions'
\ No newline at end of file
+        db_table = 'card_transactions'
+        indexes = [
+            models.Index(
+                fields=['card', '-created_at', '-id'],
+                include=['transaction', 'merchant_name', 'merchant_category', 'authorization_code'],
+                name='cardtxn_card_ts_idx',
+            ),
+        ]
+
+@receiver(post_save, sender=CardTransaction)
+def invalidate_card_transactions_cache(sender, instance, **kwargs):
+    """Drop cached transaction pages for the card a row was written to."""
+    bump_cache_generation(f"cardtxn:{instance.card_id}")
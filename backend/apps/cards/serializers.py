@@ -7,20 +7,24 @@ Card Serializers for FinTech Banking API
 @created 2024-01-20
 """
 from rest_framework import serializers
-from .models import Card, CardTransaction
-from apps.accounts.models import Account
+from .models import Card, CardTransaction, CardType, CardStatus, VIRTUAL_CARD_TYPES
+from apps.accounts.models import AccountType
+from apps.accounts.serializers import CachedFieldsMixin, ChoiceCodeField, PlainDictMixin, PlainListSerializer
 
-class CardSerializer(serializers.ModelSerializer):
+class CardSerializer(PlainDictMixin, CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for card data with security considerations.
     """
     masked_card_number = serializers.SerializerMethodField()
     remaining_limit = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     is_limit_exceeded = serializers.BooleanField(read_only=True)
-    account_name = serializers.CharField(source='account.account_type', read_only=True)
+    account_name = ChoiceCodeField(AccountType, source='account.account_type', read_only=True)
+    card_type = ChoiceCodeField(CardType)
+    status = ChoiceCodeField(CardStatus, required=False)
     
     class Meta:
         model = Card
+        list_serializer_class = PlainListSerializer
         fields = [
             'id', 'account', 'account_name', 'card_type', 'status', 'nickname',
             'masked_card_number', 'expiry_month', 'expiry_year',
@@ -34,16 +38,23 @@ class CardSerializer(serializers.ModelSerializer):
             'remaining_limit', 'is_limit_exceeded', 'created_at', 'updated_at', 'last_used_at'
         ]
     
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the account read by account_name to avoid a query per card."""
+        return queryset.select_related('account')
+    
     def get_masked_card_number(self, obj):
         """Return masked card number for security."""
-        if obj.card_number:
-            return f"•••• •••• •••• {obj.card_number[-4:]}"
+        if obj.last4:
+            return f"•••• •••• •••• {obj.last4}"
         return "•••• •••• •••• ••••"
 
 class CardCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating new cards.
     """
+    card_type = ChoiceCodeField(CardType)
+    
     class Meta:
         model = Card
         fields = ['account', 'card_type', 'nickname']
@@ -59,6 +70,8 @@ class VirtualCardCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating virtual cards with specific parameters.
     """
+    card_type = ChoiceCodeField(CardType)
+    
     class Meta:
         model = Card
         fields = [
@@ -68,8 +81,7 @@ class VirtualCardCreateSerializer(serializers.ModelSerializer):
     
     def validate_card_type(self, value):
         """Ensure only virtual card types are allowed."""
-        virtual_types = ['virtual', 'virtual_single_use', 'virtual_merchant_locked', 'virtual_subscription']
-        if value not in virtual_types:
+        if value not in VIRTUAL_CARD_TYPES:
             raise serializers.ValidationError("Only virtual card types are allowed")
         return value
     
@@ -78,11 +90,11 @@ class VirtualCardCreateSerializer(serializers.ModelSerializer):
         card_type = attrs['card_type']
         
         # Merchant-locked cards require merchant name
-        if card_type == 'virtual_merchant_locked' and not attrs.get('merchant_name'):
+        if card_type == CardType.VIRTUAL_MERCHANT_LOCKED and not attrs.get('merchant_name'):
             raise serializers.ValidationError("Merchant name is required for merchant-locked cards")
         
         # Single-use cards should have usage limit of 1
-        if card_type == 'virtual_single_use':
+        if card_type == CardType.VIRTUAL_SINGLE_USE:
             attrs['max_usage_count'] = 1
         
         return attrs
@@ -103,4 +115,9 @@ class CardTransactionSerializer(serializers.ModelSerializer):
             'transaction_amount', 'transaction_currency', 'transaction_status',
             'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the transaction and card rows read by the nested sources."""
+        return queryset.select_related('transaction', 'card')
\ No newline at end of file
@@ -10,11 +10,34 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Card, CardTransaction
+from rest_framework.renderers import JSONRenderer
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse
+from datetime import datetime
+import base64
+from .models import Card, CardTransaction, CardStatus, VIRTUAL_CARD_TYPES
 from .serializers import CardSerializer, CardCreateSerializer, VirtualCardCreateSerializer
-from apps.accounts.models import Account
+from apps.accounts.models import Account, AccountType
+from apps.accounts.utils import cache_generation
+
+CARD_TRANSACTIONS_CACHE_TTL = 60  # seconds
+CARD_TRANSACTIONS_MAX_LIMIT = 100
+
+# Statuses a cardholder may switch to themselves, keyed by API code.
+TOGGLEABLE_STATUSES = {
+    status_choice.code: status_choice
+    for status_choice in (CardStatus.ACTIVE, CardStatus.INACTIVE, CardStatus.BLOCKED)
+}
+
+def encode_cursor(created_at, pk):
+    """Opaque keyset cursor for the row a page ended on."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError on malformed input."""
+    created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(pk)
 
 class CardViewSet(viewsets.ModelViewSet):
     """
@@ -25,8 +48,9 @@ class CardViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter cards for authenticated user's accounts."""
-        user_accounts = Account.objects.filter(user=self.request.user)
-        return Card.objects.filter(account__in=user_accounts)
+        return CardSerializer.setup_eager_loading(
+            Card.objects.filter(account__user=self.request.user)
+        )
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -44,7 +68,7 @@ class CardViewSet(viewsets.ModelViewSet):
             account_id = request.data.get('account_id')
             if account_id:
                 try:
-                    account = Account.objects.get(id=account_id, user=request.user)
+                    account = Account.objects.only('id', 'account_type').get(id=account_id, user=request.user)
                 except Account.DoesNotExist:
                     return Response({
                         'error': {
@@ -56,9 +80,9 @@ class CardViewSet(viewsets.ModelViewSet):
                 # Use primary checking account
                 account = Account.objects.filter(
                     user=request.user, 
-                    account_type='checking',
+                    account_type=AccountType.CHECKING,
                     is_active=True
-                ).first()
+                ).only('id', 'account_type').first()
                 
                 if not account:
                     return Response({
@@ -88,9 +112,9 @@ class CardViewSet(viewsets.ModelViewSet):
     def toggle_status(self, request, pk=None):
         """Activate or deactivate a card."""
         card = self.get_object()
-        new_status = request.data.get('status')
+        new_status = TOGGLEABLE_STATUSES.get(request.data.get('status'))
         
-        if new_status not in ['active', 'inactive', 'blocked']:
+        if new_status is None:
             return Response({
                 'error': {
                     'code': 'INVALID_STATUS',
@@ -105,55 +129,117 @@ class CardViewSet(viewsets.ModelViewSet):
             'success': True,
             'data': {
                 'id': card.id,
-                'status': card.status,
+                'status': new_status.code,
                 'updated_at': card.updated_at
             }
         })
     
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
-        """Get transactions for a specific card."""
+        """
+        Get transactions for a specific card.
+        
+        Pages are cached as rendered JSON until the card gets a new
+        transaction (see invalidate_card_transactions_cache) or the TTL ends.
+        """
         card = self.get_object()
         
+        # Pagination
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({
+                'error': {
+                    'code': 'INVALID_PAGINATION',
+                    'message': 'limit and offset must be integers'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), CARD_TRANSACTIONS_MAX_LIMIT)
+        offset = max(offset, 0)
+        cursor = request.query_params.get('cursor')
+        include_total = request.query_params.get('include_total') == 'true'
+        
+        if cursor:
+            try:
+                cursor_ts, cursor_id = decode_cursor(cursor)
+            except ValueError:
+                return Response({
+                    'error': {
+                        'code': 'INVALID_CURSOR',
+                        'message': 'Pagination cursor is malformed'
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        generation = cache_generation(f"cardtxn:{card.id}")
+        cache_key = f"cardtxn:{card.id}:g{generation}:{limit}:{offset}:{int(include_total)}:{cursor or ''}"
+        body = cache.get(cache_key)
+        if body is not None:
+            return HttpResponse(body, content_type='application/json')
+        
         # Get card transactions
-        card_transactions = CardTransaction.objects.filter(card=card).order_by('-created_at')
+        card_transactions = CardTransaction.objects.filter(card=card).order_by('-created_at', '-id')
         
-        # Pagination
-        limit = int(request.query_params.get('limit', 20))
-        offset = int(request.query_params.get('offset', 0))
-        
-        transactions = card_transactions[offset:offset + limit]
-        
-        transaction_data = []
-        for card_txn in transactions:
-            transaction_data.append({
-                'id': card_txn.transaction.id,
-                'amount': card_txn.transaction.amount,
-                'currency': card_txn.transaction.currency,
-                'merchant_name': card_txn.merchant_name,
-                'merchant_category': card_txn.merchant_category,
-                'status': card_txn.transaction.status,
-                'created_at': card_txn.created_at,
-                'authorization_code': card_txn.authorization_code
-            })
+        if cursor:
+            # Keyset pagination: range scan from the last row of the previous page
+            page = card_transactions.filter(
+                Q(created_at__lt=cursor_ts) | Q(created_at=cursor_ts, id__lt=cursor_id)
+            )[:limit + 1]
+        else:
+            # Legacy offset callers: skip rows on the narrow pk index only
+            page = card_transactions.filter(
+                pk__in=card_transactions.values('pk')[offset:offset + limit + 1]
+            )
         
-        return Response({
+        # Project only the returned columns; no model instances are built.
+        # One extra row is fetched so has_more needs no COUNT(*).
+        rows = list(page.values(
+            'id', 'transaction__id', 'transaction__amount', 'transaction__currency',
+            'transaction__status', 'merchant_name', 'merchant_category',
+            'created_at', 'authorization_code'
+        ))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more and rows else None
+        
+        transaction_data = [
+            {
+                'id': row['transaction__id'],
+                'amount': row['transaction__amount'],
+                'currency': row['transaction__currency'],
+                'merchant_name': row['merchant_name'],
+                'merchant_category': row['merchant_category'],
+                'status': row['transaction__status'],
+                'created_at': row['created_at'],
+                'authorization_code': row['authorization_code']
+            }
+            for row in rows
+        ]
+        
+        pagination = {
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }
+        # COUNT(*) scans the card's whole history; only run it on request
+        if include_total:
+            pagination['total'] = card_transactions.count()
+        
+        body = JSONRenderer().render({
             'success': True,
             'data': transaction_data,
-            'pagination': {
-                'total': card_transactions.count(),
-                'limit': limit,
-                'offset': offset,
-                'has_more': card_transactions.count() > offset + limit
-            }
+            'pagination': pagination
         })
+        cache.set(cache_key, body, CARD_TRANSACTIONS_CACHE_TTL)
+        return HttpResponse(body, content_type='application/json')
     
     @action(detail=True, methods=['patch'])
     def update_limits(self, request, pk=None):
         """Update spending limits for virtual cards."""
         card = self.get_object()
         
-        if card.card_type not in ['virtual', 'virtual_single_use', 'virtual_merchant_locked', 'virtual_subscription']:
+        if card.card_type not in VIRTUAL_CARD_TYPES:
             return Response({
                 'error': {
                     'code': 'INVALID_CARD_TYPE',
@@ -0,0 +1,18 @@
+"""
+Recurring Transaction Scheduler for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.transactions.models import RecurringTransaction
+
+class Command(BaseCommand):
+    help = 'Create pending transactions for every due recurring transaction and advance their schedules.'
+    
+    def handle(self, *args, **options):
+        transactions = RecurringTransaction.objects.execute_due(timezone.now())
+        self.stdout.write(self.style.SUCCESS(f"Executed {len(transactions)} recurring transactions"))
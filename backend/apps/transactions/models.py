@@ -11,10 +11,25 @@ Transaction models for comprehensive financial tracking.
 Supports both traditional banking and Web3 transactions.
 """
 
+from django.core.validators import MaxValueValidator
 from django.db import models
+from django.db import transaction as db_tx
+from django.db.models import Case, DateTimeField, DurationField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
 from decimal import Decimal
+from apps.accounts.fields import ScaledDecimalField
+from apps.accounts.models import Account
+from apps.accounts.utils import bump_cache_generation
+from apps.cards.models import CardTransaction
+import base64
+import binascii
 import uuid
 
 class Transaction(models.Model):
@@ -81,18 +96,17 @@ class Transaction(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
     # Amount and currency
-    amount = models.DecimalField(max_digits=20, decimal_places=8)
+    amount = ScaledDecimalField()
     currency = models.CharField(max_length=10, choices=CURRENCY_CHOICES)
-    fee_amount = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('0'))
+    fee_amount = ScaledDecimalField(default=Decimal('0'))
     exchange_rate = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('1'))
     
     # Transaction metadata
-    reference_number = models.CharField(max_length=50, unique=True, db_index=True)
     description = models.TextField(blank=True)
-    external_reference = models.CharField(max_length=100, blank=True, db_index=True)
+    external_reference = models.CharField(max_length=100, blank=True)
     
     # Web3 specific fields
-    blockchain_hash = models.CharField(max_length=66, blank=True, db_index=True)
+    blockchain_hash = models.CharField(max_length=66, blank=True)
     block_number = models.BigIntegerField(null=True, blank=True)
     gas_used = models.BigIntegerField(null=True, blank=True)
     gas_price = models.BigIntegerField(null=True, blank=True)
@@ -105,7 +119,7 @@ class Transaction(models.Model):
     compliance_status = models.CharField(max_length=20, default='cleared')
     
     # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     settled_at = models.DateTimeField(null=True, blank=True)
@@ -118,12 +132,16 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'transactions'
         indexes = [
-            models.Index(fields=['reference_number']),
             models.Index(fields=['blockchain_hash']),
             models.Index(fields=['external_reference']),
             models.Index(fields=['created_at', 'status']),
             models.Index(fields=['from_account', 'created_at']),
             models.Index(fields=['to_account', 'created_at']),
+            models.Index(
+                fields=['from_account', 'created_at'],
+                condition=models.Q(status='completed'),
+                name='tx_completed_from_idx',
+            ),
             models.Index(fields=['transaction_type', 'currency']),
         ]
         ordering = ['-created_at']
@@ -132,23 +150,37 @@ class Transaction(models.Model):
         return f"{self.transaction_type.title()} - {self.amount} {self.currency} ({self.status})"
     
     def save(self, *args, **kwargs):
-        if not self.reference_number:
-            self.reference_number = self.generate_reference_number()
         super().save(*args, **kwargs)
-    
-    def generate_reference_number(self):
-        """Generate unique reference number for the transaction."""
-        import random
-        import string
-        from django.utils import timezone
-        
-        timestamp = timezone.now().strftime('%Y%m%d')
-        random_suffix = ''.join(random.choices(string.digits, k=8))
-        return f"TXN{timestamp}{random_suffix}"
+        # Drop a net_amount cached or annotated from the values before this save
+        self.__dict__.pop('net_amount', None)
     
     @property
+    def reference_number(self):
+        """
+        Customer-facing reference: the full 128-bit id in base32, so it is
+        unique and maps back to the primary key (see id_from_reference).
+        """
+        return f"TXN{base64.b32encode(self.id.bytes).decode().rstrip('=')}"
+    
+    @staticmethod
+    def id_from_reference(reference):
+        """Primary key for a reference_number; raises ValueError if malformed."""
+        reference = reference.strip().upper()
+        if not reference.startswith('TXN') or len(reference) != 29:
+            raise ValueError(f"Invalid transaction reference: {reference}")
+        try:
+            return uuid.UUID(bytes=base64.b32decode(reference[3:] + '======'))
+        except binascii.Error as e:
+            raise ValueError(f"Invalid transaction reference: {reference}") from e
+    
+    @cached_property
     def net_amount(self):
-        """Calculate net amount including fees."""
+        """
+        Calculate net amount including fees.
+        
+        Querysets annotated with net_amount (see
+        TransactionSerializer.setup_eager_loading) pre-fill this value.
+        """
         return self.amount - self.fee_amount
     
     @property
@@ -196,13 +228,148 @@ class TransactionTag(models.Model):
     
     class Meta:
         db_table = 'transaction_tags'
-        unique_together = [['transaction', 'name']]
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'name'], name='uniq_txn_tag'),
+        ]
     
     def __str__(self):
         if self.value:
             return f"{self.name}: {self.value}"
         return self.name
 
+# Step added to last_executed for each recurrence frequency
+FREQUENCY_DELTAS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+    'biweekly': timedelta(weeks=2),
+    'monthly': relativedelta(months=1),
+    'quarterly': relativedelta(months=3),
+    'yearly': relativedelta(years=1),
+}
+
+# Largest amount a Transaction row can hold; templates must stay below it
+_AMOUNT_FIELD = Transaction._meta.get_field('amount')
+TRANSACTION_AMOUNT_LIMIT = Decimal(10) ** (_AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places)
+
+# The same steps as SQL intervals, so schedules advance inside an UPDATE
+FREQUENCY_INTERVALS = {
+    'daily': '1 day',
+    'weekly': '7 days',
+    'biweekly': '14 days',
+    'monthly': '1 month',
+    'quarterly': '3 months',
+    'yearly': '1 year',
+}
+
+class RecurringTransactionQuerySet(models.QuerySet):
+    """
+    Scheduler helpers for recurring transaction templates.
+    """
+    def due(self, now):
+        """
+        Active templates whose next execution is at or before ``now`` and
+        that have neither passed their end date nor reached max_executions.
+        """
+        return self.filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=now.date()),
+            Q(max_executions__isnull=True) | Q(execution_count__lt=F('max_executions')),
+            is_active=True,
+            next_execution__lte=now,
+        )
+    
+    @staticmethod
+    def exhausted_q(now):
+        """Condition for templates past their end date or at their execution cap."""
+        return (
+            Q(end_date__lt=now.date())
+            | Q(max_executions__isnull=False, execution_count__gte=F('max_executions'))
+        )
+    
+    def exhausted(self, now):
+        """Templates past their end date or at their execution cap."""
+        return self.filter(self.exhausted_q(now))
+    
+    def advance(self, now, **fields):
+        """
+        Record an execution at ``now`` for every row with a single UPDATE.
+        
+        next_execution steps one period from its scheduled value, not from
+        ``now``, so late runs do not drift and missed periods are each run
+        in turn; the step is resolved per frequency in SQL. A row that
+        reaches max_executions is deactivated in the same statement. Extra
+        ``fields`` are written too.
+        """
+        return self.update(
+            **fields,
+            last_executed=now,
+            execution_count=F('execution_count') + 1,
+            next_execution=Case(
+                *[When(frequency=frequency, then=ExpressionWrapper(
+                    F('next_execution') + Cast(Value(interval), DurationField()),
+                    output_field=DateTimeField(),
+                  ))
+                  for frequency, interval in FREQUENCY_INTERVALS.items()],
+                default=F('next_execution'),
+            ),
+            is_active=Case(
+                When(max_executions__lte=F('execution_count') + 1, then=Value(False)),
+                default=F('is_active'),
+            ),
+            updated_at=now,
+        )
+    
+    def execute_due(self, now):
+        """
+        Execute every due template in one database transaction.
+        
+        Due rows are locked with SKIP LOCKED so concurrent scheduler runs
+        split the work instead of double-charging; their transactions are
+        inserted with one bulk_create and the templates advanced with one
+        UPDATE. Returns the created transactions.
+        """
+        with db_tx.atomic():
+            # Retire templates that expired or hit their cap without running,
+            # and any whose amount could not be stored on a Transaction, so
+            # one bad row cannot abort the batch insert on every run
+            self.filter(
+                self.exhausted_q(now)
+                | Q(amount__gte=TRANSACTION_AMOUNT_LIMIT) | Q(amount__lte=-TRANSACTION_AMOUNT_LIMIT),
+                is_active=True,
+            ).update(is_active=False, updated_at=now)
+            
+            templates = list(self.due(now).select_for_update(skip_locked=True).values(
+                'id', 'from_account_id', 'to_account_id', 'transaction_type',
+                'amount', 'currency', 'description'
+            ))
+            if not templates:
+                return []
+            
+            transactions = [
+                Transaction(
+                    from_account_id=template['from_account_id'],
+                    to_account_id=template['to_account_id'],
+                    transaction_type=template['transaction_type'],
+                    amount=template['amount'],
+                    currency=template['currency'],
+                    description=template['description'],
+                    status='pending'
+                )
+                for template in templates
+            ]
+            Transaction.objects.bulk_create(transactions, batch_size=500)
+            # bulk_create() sends no post_save
+            invalidate_transaction_reports(transactions)
+            
+            self.model.objects.filter(pk__in=[template['id'] for template in templates]).advance(
+                now,
+                last_transaction=Case(
+                    *[When(pk=template['id'], then=Value(txn.pk))
+                      for template, txn in zip(templates, transactions)],
+                    default=F('last_transaction'),
+                ),
+            )
+        return transactions
+
 class RecurringTransaction(models.Model):
     """
     Template for recurring transactions (subscriptions, salaries, etc.).
@@ -224,7 +391,11 @@ class RecurringTransaction(models.Model):
     to_account = models.ForeignKey('accounts.Account', on_delete=models.CASCADE, related_name='recurring_incoming', null=True, blank=True)
     
     transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
-    amount = models.DecimalField(max_digits=20, decimal_places=8)
+    # Bounded to what the generated Transaction.amount can hold
+    amount = models.DecimalField(
+        max_digits=20, decimal_places=8,
+        validators=[MaxValueValidator(TRANSACTION_AMOUNT_LIMIT - Decimal('0.00000001'))]
+    )
     currency = models.CharField(max_length=10, choices=Transaction.CURRENCY_CHOICES)
     description = models.TextField(blank=True)
     category = models.ForeignKey(TransactionCategory, on_delete=models.SET_NULL, null=True, blank=True)
@@ -247,6 +418,8 @@ class RecurringTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = RecurringTransactionQuerySet.as_manager()
+    
     class Meta:
         db_table = 'recurring_transactions'
         indexes = [
@@ -258,27 +431,11 @@ class RecurringTransaction(models.Model):
         return f"{self.description or self.transaction_type.title()} - {self.frequency}"
     
     def calculate_next_execution(self):
-        """Calculate the next execution date based on frequency."""
-        from datetime import timedelta
-        from dateutil.relativedelta import relativedelta
-        
-        if not self.last_executed:
+        """Calculate the next execution date one period after the scheduled one."""
+        delta = FREQUENCY_DELTAS.get(self.frequency)
+        if delta is None:
             return self.next_execution
-        
-        if self.frequency == 'daily':
-            return self.last_executed + timedelta(days=1)
-        elif self.frequency == 'weekly':
-            return self.last_executed + timedelta(weeks=1)
-        elif self.frequency == 'biweekly':
-            return self.last_executed + timedelta(weeks=2)
-        elif self.frequency == 'monthly':
-            return self.last_executed + relativedelta(months=1)
-        elif self.frequency == 'quarterly':
-            return self.last_executed + relativedelta(months=3)
-        elif self.frequency == 'yearly':
-            return self.last_executed + relativedelta(years=1)
-        
-        return self.next_execution
+        return self.next_execution + delta
 
 class TransactionLimit(models.Model):
     """
@@ -308,7 +465,12 @@ class TransactionLimit(models.Model):
     
     class Meta:
         db_table = 'transaction_limits'
-        unique_together = [['user', 'account', 'transaction_type', 'limit_type']]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'account', 'transaction_type', 'limit_type'],
+                name='uniq_txn_limit',
+            ),
+        ]
     
     @property
     def remaining_limit(self):
@@ -362,4 +524,36 @@ class TransactionDispute(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Dispute #{self.id.hex[:8]} - {self.reason.title()}"
\ No newline at end of file
+        return f"Dispute #{self.id.hex[:8]} - {self.reason.title()}"
+
+def invalidate_transaction_reports(transactions):
+    """
+    Drop cached analytics/categories for the users on either side of
+    ``transactions``, and cached transaction pages for any card they are
+    linked to. Paths that write transactions without save() (bulk inserts,
+    queryset updates) must call this themselves.
+    """
+    transaction_ids = [txn.pk for txn in transactions]
+    account_ids = {
+        pk for txn in transactions for pk in (txn.from_account_id, txn.to_account_id) if pk
+    }
+    if not transaction_ids:
+        return
+    
+    def bump():
+        user_ids = Account.objects.filter(pk__in=account_ids).values_list('user_id', flat=True)
+        for user_id in set(user_ids):
+            bump_cache_generation(f"tx:{user_id}")
+        card_ids = CardTransaction.objects.filter(
+            transaction_id__in=transaction_ids
+        ).values_list('card_id', flat=True)
+        for card_id in set(card_ids):
+            bump_cache_generation(f"cardtxn:{card_id}")
+    
+    # After commit, so a concurrent request cannot re-cache pre-commit data
+    db_tx.on_commit(bump)
+
+@receiver(post_save, sender=Transaction)
+def invalidate_transaction_reports_cache(sender, instance, **kwargs):
+    """Drop cached analytics/categories for the users on either side."""
+    invalidate_transaction_reports([instance])
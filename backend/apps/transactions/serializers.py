@@ -7,21 +7,29 @@ Transaction Serializers for FinTech Banking API
 @created 2024-01-20
 """
 from rest_framework import serializers
-from decimal import Decimal
-from .models import Transaction, TransactionCategory, RecurringTransaction, TransactionDispute
-from apps.accounts.models import Account
+from django.db import transaction as db_tx
+from django.db.models import ExpressionWrapper, F, Value
+from django.utils import timezone
+from .models import (
+    Transaction, TransactionCategory, RecurringTransaction, TransactionDispute,
+    invalidate_transaction_reports
+)
+from apps.accounts.fields import ScaledDecimalField
+from apps.accounts.models import Account, AccountType
+from apps.accounts.serializers import CachedFieldsMixin, ChoiceCodeField, PlainDictMixin, PlainListSerializer
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(PlainDictMixin, CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for transaction data with calculated fields.
     """
     net_amount = serializers.DecimalField(max_digits=20, decimal_places=8, read_only=True)
     is_blockchain_transaction = serializers.BooleanField(read_only=True)
-    from_account_name = serializers.CharField(source='from_account.account_type', read_only=True)
-    to_account_name = serializers.CharField(source='to_account.account_type', read_only=True)
+    from_account_name = ChoiceCodeField(AccountType, source='from_account.account_type', read_only=True)
+    to_account_name = ChoiceCodeField(AccountType, source='to_account.account_type', read_only=True)
     
     class Meta:
         model = Transaction
+        list_serializer_class = PlainListSerializer
         fields = [
             'id', 'from_account', 'to_account', 'transaction_type', 'status',
             'amount', 'currency', 'fee_amount', 'exchange_rate', 'net_amount',
@@ -36,11 +44,30 @@ class TransactionSerializer(serializers.ModelSerializer):
             'id', 'reference_number', 'net_amount', 'is_blockchain_transaction',
             'from_account_name', 'to_account_name', 'created_at', 'updated_at'
         ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Join the accounts read by from_account_name/to_account_name and
+        compute net_amount in SQL instead of per instance in Python.
+        """
+        return queryset.select_related('from_account', 'to_account').annotate(
+            net_amount=ExpressionWrapper(F('amount') - F('fee_amount'), output_field=ScaledDecimalField())
+        )
 
 class TransactionCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating new transactions.
     """
+    # Load only what validation reads; balances are updated with F() later
+    from_account = serializers.PrimaryKeyRelatedField(
+        queryset=Account.objects.only('id', 'user', 'available_balance'),
+        required=False, allow_null=True
+    )
+    to_account = serializers.PrimaryKeyRelatedField(
+        queryset=Account.objects.only('id'), required=False, allow_null=True
+    )
+    
     class Meta:
         model = Transaction
         fields = [
@@ -56,7 +83,7 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
         
         # Check account ownership
         user = self.context['request'].user
-        if from_account and from_account.user != user:
+        if from_account and from_account.user_id != user.pk:
             raise serializers.ValidationError("You don't own the source account")
         
         # Check sufficient funds
@@ -71,31 +98,51 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """Create transaction with business logic."""
-        transaction = Transaction.objects.create(**validated_data)
-        
-        # Process the transaction
-        self._process_transaction(transaction)
+        with db_tx.atomic():
+            transaction = Transaction.objects.create(**validated_data)
+            
+            # Process the transaction
+            self._process_transaction(transaction)
         
         return transaction
     
     def _process_transaction(self, transaction):
-        """Process transaction and update account balances."""
-        if transaction.from_account:
-            # Deduct from source account
-            transaction.from_account.available_balance -= transaction.amount
-            transaction.from_account.save()
+        """
+        Process transaction and update account balances.
+        
+        Balances are adjusted in the database with F() expressions, so
+        concurrent transfers cannot overwrite each other's results.
+        """
+        now = timezone.now()
+        # Bind the amount to the balance field so it is scaled like the column
+        amount = Value(transaction.amount, output_field=Account._meta.get_field('available_balance'))
+        
+        if transaction.from_account_id:
+            # Deduct from source account only if it still covers the amount;
+            # validate() ran before the lock, so a concurrent debit may have
+            # spent the funds since. Raising rolls back create()'s atomic block.
+            debited = Account.objects.filter(
+                pk=transaction.from_account_id, available_balance__gte=amount
+            ).update(available_balance=F('available_balance') - amount, updated_at=now)
+            if not debited:
+                raise serializers.ValidationError("Insufficient funds")
         
-        if transaction.to_account:
+        if transaction.to_account_id:
             # Add to destination account
-            transaction.to_account.available_balance += transaction.amount
-            transaction.to_account.save()
+            Account.objects.filter(pk=transaction.to_account_id).update(
+                available_balance=F('available_balance') + amount, updated_at=now
+            )
         
         # Update transaction status
         transaction.status = 'completed'
-        transaction.processed_at = timezone.now()
-        transaction.save()
+        transaction.processed_at = now
+        Transaction.objects.filter(pk=transaction.pk).update(
+            status=transaction.status, processed_at=now, updated_at=now
+        )
+        # QuerySet.update() sends no post_save
+        invalidate_transaction_reports([transaction])
 
-class TransactionCategorySerializer(serializers.ModelSerializer):
+class TransactionCategorySerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for transaction categories.
     """
@@ -110,7 +157,7 @@ class TransactionCategorySerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
-class RecurringTransactionSerializer(serializers.ModelSerializer):
+class RecurringTransactionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for recurring transactions.
     """
@@ -127,7 +174,7 @@ class RecurringTransactionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'execution_count', 'last_executed', 'created_at', 'updated_at']
 
-class TransactionDisputeSerializer(serializers.ModelSerializer):
+class TransactionDisputeSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for transaction disputes.
     """
@@ -9,17 +9,33 @@ Transaction API Views for FinTech Banking Platform
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count
+from django.core.cache import cache
+from django.db import IntegrityError, transaction as db_tx
+from django.db.models import CharField, Count, F, Func, Q, Sum, Value
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.utils.cache import patch_cache_control
+from datetime import date, timedelta
 from decimal import Decimal
-from .models import Transaction, TransactionCategory, RecurringTransaction, TransactionDispute
+from .models import Transaction, TransactionCategory, RecurringTransaction
 from .serializers import (
     TransactionSerializer, TransactionCreateSerializer, TransactionCategorySerializer,
     RecurringTransactionSerializer, TransactionDisputeSerializer
 )
 from apps.accounts.models import Account
+from apps.accounts.utils import cache_generation, idempotent
+
+REPORT_CACHE_TTL = 300  # seconds
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the newest-first transaction history, so deep
+    pages are index seeks rather than OFFSET scans.
+    """
+    ordering = '-created_at'
+    page_size = 50
 
 class TransactionViewSet(viewsets.ModelViewSet):
     """
@@ -27,13 +43,16 @@ class TransactionViewSet(viewsets.ModelViewSet):
     """
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionCursorPagination
     
     def get_queryset(self):
         """Filter transactions for authenticated user's accounts."""
         user_accounts = Account.objects.filter(user=self.request.user)
-        return Transaction.objects.filter(
-            Q(from_account__in=user_accounts) | Q(to_account__in=user_accounts)
-        ).order_by('-created_at')
+        return TransactionSerializer.setup_eager_loading(
+            Transaction.objects.filter(
+                Q(from_account__in=user_accounts) | Q(to_account__in=user_accounts)
+            ).order_by('-created_at')
+        )
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -43,57 +62,76 @@ class TransactionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get transaction categories with spending analysis."""
-        user_accounts = Account.objects.filter(user=request.user)
-        
-        # Get transactions from last 30 days
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        transactions = Transaction.objects.filter(
-            from_account__in=user_accounts,
-            created_at__gte=thirty_days_ago,
-            status='completed'
+        cache_key = f"tx:categories:{request.user.id}:g{cache_generation(f'tx:{request.user.id}')}:{date.today()}"
+        category_data = cache.get_or_set(
+            cache_key, lambda: self._category_spending(request.user), REPORT_CACHE_TTL
         )
         
-        # Group by category
-        categories = TransactionCategory.objects.filter(is_active=True)
-        category_data = []
-        
-        for category in categories:
-            category_transactions = transactions.filter(
-                tags__category=category
-            )
-            
-            total_spent = category_transactions.aggregate(
-                total=Sum('amount')
-            )['total'] or Decimal('0')
-            
-            category_data.append({
-                'id': category.id,
-                'name': category.name,
-                'icon': category.icon,
-                'color': category.color,
-                'total_spent': float(total_spent),
-                'transaction_count': category_transactions.count(),
-                'percentage': 0  # Will calculate after getting total
-            })
-        
-        # Calculate percentages
-        total_spending = sum(cat['total_spent'] for cat in category_data)
-        if total_spending > 0:
-            for cat in category_data:
-                cat['percentage'] = (cat['total_spent'] / total_spending) * 100
-        
-        return Response({
+        response = Response({
             'success': True,
             'data': category_data
         })
+        patch_cache_control(response, private=True, max_age=REPORT_CACHE_TTL)
+        return response
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         """Get transaction analytics and insights."""
-        user_accounts = Account.objects.filter(user=request.user)
+        days = int(request.query_params.get('days', 30))
+        
+        cache_key = f"tx:analytics:{request.user.id}:g{cache_generation(f'tx:{request.user.id}')}:{days}:{date.today()}"
+        analytics_data = cache.get_or_set(
+            cache_key, lambda: self._analytics(request.user, days), REPORT_CACHE_TTL
+        )
+        
+        response = Response({
+            'success': True,
+            'data': analytics_data
+        })
+        patch_cache_control(response, private=True, max_age=REPORT_CACHE_TTL)
+        return response
+    
+    def _category_spending(self, user):
+        """Spending per active category over the last 30 days."""
+        # Completed outgoing transactions from the last 30 days, reached
+        # from each category through its tags
+        thirty_days_ago = timezone.now() - timedelta(days=30)
+        spending = Q(
+            transactiontag__transaction__from_account__user=user,
+            transactiontag__transaction__created_at__gte=thirty_days_ago,
+            transactiontag__transaction__status='completed'
+        )
+        
+        # Group by category in a single query; categories without spending
+        # keep a zero total
+        categories = TransactionCategory.objects.filter(is_active=True).annotate(
+            total_spent=Sum('transactiontag__transaction__amount', filter=spending),
+            transaction_count=Count('transactiontag__transaction', filter=spending)
+        ).values('id', 'name', 'icon', 'color', 'total_spent', 'transaction_count')
+        
+        categories = list(categories)
+        total_spending = sum((category['total_spent'] or Decimal('0') for category in categories), Decimal('0'))
+        
+        # Percentages are computed in Decimal and cast to float once
+        return [
+            {
+                'id': category['id'],
+                'name': category['name'],
+                'icon': category['icon'],
+                'color': category['color'],
+                'total_spent': float(category['total_spent'] or Decimal('0')),
+                'transaction_count': category['transaction_count'],
+                'percentage': float(category['total_spent'] * 100 / total_spending)
+                if total_spending and category['total_spent'] else 0
+            }
+            for category in categories
+        ]
+    
+    def _analytics(self, user, days):
+        """Transaction totals and daily volume over the last ``days`` days."""
+        user_accounts = Account.objects.filter(user=user)
         
         # Date range filtering
-        days = int(request.query_params.get('days', 30))
         start_date = timezone.now() - timedelta(days=days)
         
         transactions = Transaction.objects.filter(
@@ -102,62 +140,74 @@ class TransactionViewSet(viewsets.ModelViewSet):
         )
         
         # Calculate metrics
-        total_transactions = transactions.count()
-        total_volume = transactions.filter(status='completed').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
+        completed = Q(status='completed')
+        totals = transactions.aggregate(
+            total_transactions=Count('id'),
+            completed_count=Count('id', filter=completed),
+            total_volume=Sum('amount', filter=completed)
+        )
+        total_transactions = totals['total_transactions']
+        total_volume = totals['total_volume'] or Decimal('0')
         
         # Success rate
-        completed_count = transactions.filter(status='completed').count()
+        completed_count = totals['completed_count']
         success_rate = (completed_count / total_transactions * 100) if total_transactions > 0 else 0
         
-        # Daily transaction volume
+        # Daily transaction volume, grouped by day in one query and keyed by
+        # the YYYY-MM-DD string Postgres formats; rows are streamed straight
+        # into the lookup rather than cached on the queryset
+        daily_totals = {
+            row['day']: row
+            for row in transactions.filter(completed).annotate(
+                day=Func(F('created_at'), Value('YYYY-MM-DD'), function='to_char', output_field=CharField())
+            ).values('day').annotate(
+                volume=Sum('amount'), count=Count('id')
+            ).order_by('day').iterator(chunk_size=2000)
+        }
+        
+        start_day = start_date.date()
         daily_data = []
         for i in range(days):
-            day = start_date + timedelta(days=i)
-            day_transactions = transactions.filter(
-                created_at__date=day.date(),
-                status='completed'
-            )
-            daily_volume = day_transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            day = (start_day + timedelta(days=i)).isoformat()
+            day_totals = daily_totals.get(day, {})
             
             daily_data.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'volume': float(daily_volume),
-                'count': day_transactions.count()
+                'date': day,
+                'volume': float(day_totals.get('volume') or Decimal('0')),
+                'count': day_totals.get('count', 0)
             })
         
-        return Response({
-            'success': True,
-            'data': {
-                'total_transactions': total_transactions,
-                'total_volume': float(total_volume),
-                'success_rate': round(success_rate, 2),
-                'daily_data': daily_data,
-                'average_transaction': float(total_volume / total_transactions) if total_transactions > 0 else 0
-            }
-        })
+        return {
+            'total_transactions': total_transactions,
+            'total_volume': float(total_volume),
+            'success_rate': round(success_rate, 2),
+            'daily_data': daily_data,
+            'average_transaction': float(total_volume / total_transactions) if total_transactions > 0 else 0
+        }
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def dispute(self, request, pk=None):
         """Create a dispute for a transaction."""
         transaction = self.get_object()
         
-        # Check if dispute already exists
-        if hasattr(transaction, 'dispute'):
-            return Response({
-                'error': {
-                    'code': 'DISPUTE_EXISTS',
-                    'message': 'A dispute already exists for this transaction'
-                }
-            }, status=status.HTTP_409_CONFLICT)
-        
         serializer = TransactionDisputeSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(
-                transaction=transaction,
-                user=request.user
-            )
+            # The one-to-one column is unique, so a second dispute fails on
+            # INSERT; the savepoint keeps the surrounding transaction usable
+            try:
+                with db_tx.atomic():
+                    serializer.save(
+                        transaction=transaction,
+                        user=request.user
+                    )
+            except IntegrityError:
+                return Response({
+                    'error': {
+                        'code': 'DISPUTE_EXISTS',
+                        'message': 'A dispute already exists for this transaction'
+                    }
+                }, status=status.HTTP_409_CONFLICT)
             return Response({
                 'success': True,
                 'data': serializer.data
@@ -193,27 +243,47 @@ class RecurringTransactionViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def execute(self, request, pk=None):
         """Manually execute a recurring transaction."""
-        recurring_transaction = self.get_object()
-        
-        # Create the actual transaction
-        transaction = Transaction.objects.create(
-            from_account=recurring_transaction.from_account,
-            to_account=recurring_transaction.to_account,
-            transaction_type=recurring_transaction.transaction_type,
-            amount=recurring_transaction.amount,
-            currency=recurring_transaction.currency,
-            description=recurring_transaction.description,
-            status='pending'
-        )
-        
-        # Update recurring transaction
-        recurring_transaction.last_executed = timezone.now()
-        recurring_transaction.execution_count += 1
-        recurring_transaction.last_transaction = transaction
-        recurring_transaction.next_execution = recurring_transaction.calculate_next_execution()
-        recurring_transaction.save()
+        with db_tx.atomic():
+            # Lock the template so concurrent executions cannot double-charge
+            recurring_transaction = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=pk
+            )
+            self.check_object_permissions(request, recurring_transaction)
+            
+            now = timezone.now()
+            if (
+                not recurring_transaction.is_active
+                or (recurring_transaction.end_date and recurring_transaction.end_date < now.date())
+                or (recurring_transaction.max_executions is not None
+                    and recurring_transaction.execution_count >= recurring_transaction.max_executions)
+            ):
+                return Response({
+                    'error': {
+                        'code': 'RECURRING_INACTIVE',
+                        'message': 'This recurring transaction is inactive, ended or at its execution limit'
+                    }
+                }, status=status.HTTP_409_CONFLICT)
+            
+            # Create the actual transaction
+            transaction = Transaction.objects.create(
+                from_account_id=recurring_transaction.from_account_id,
+                to_account_id=recurring_transaction.to_account_id,
+                transaction_type=recurring_transaction.transaction_type,
+                amount=recurring_transaction.amount,
+                currency=recurring_transaction.currency,
+                description=recurring_transaction.description,
+                status='pending'
+            )
+            
+            # Update recurring transaction; the counter is incremented in SQL
+            RecurringTransaction.objects.filter(pk=recurring_transaction.pk).advance(
+                now, last_transaction=transaction
+            )
+            recurring_transaction.last_executed = now
+            recurring_transaction.next_execution = recurring_transaction.calculate_next_execution()
         
         return Response({
             'success': True,
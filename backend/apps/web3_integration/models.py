@@ -6,8 +6,13 @@ Web3 Integration Models for FinTech Banking Platform
 @license Commercial License - Proprietary Software
 @created 2024-01-20
 """
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
 from decimal import Decimal
+from .utils import NETWORKS_CACHE_KEY, clear_active_networks
 import uuid
 
 class SupportedNetwork(models.Model):
@@ -82,6 +87,15 @@ class WalletBalance(models.Model):
     class Meta:
         db_table = 'wallet_balances'
         unique_together = [['user', 'token', 'wallet_address']]
+        indexes = [
+            # balances() looks a wallet up by owner and address
+            models.Index(fields=['user', 'wallet_address'], name='wb_user_addr_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Store addresses lowercased so lookups are a plain equality on the index
+        self.wallet_address = self.wallet_address.lower()
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.email} - {self.balance} {self.token.symbol}"
@@ -187,14 +201,31 @@ class DeFiPosition(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.protocol_name} {self.position_type}"
     
-    @property
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Drop P&L cached or annotated from the values before this save
+        self.__dict__.pop('profit_loss', None)
+        self.__dict__.pop('profit_loss_percentage', None)
+    
+    @cached_property
     def profit_loss(self):
-        """Calculate profit/loss for the position."""
+        """
+        Calculate profit/loss for the position.
+        
+        Querysets prepared by DeFiPositionSerializer.setup_eager_loading
+        pre-fill this and profit_loss_percentage from SQL.
+        """
         return self.amount_current + self.rewards_earned - self.amount_deposited
     
-    @property
+    @cached_property
     def profit_loss_percentage(self):
         """Calculate profit/loss percentage."""
         if self.amount_deposited == 0:
             return Decimal('0')
-        return (self.profit_loss / self.amount_deposited) * 100
\ No newline at end of file
+        return (self.profit_loss / self.amount_deposited) * 100
+
+@receiver([post_save, post_delete], sender=SupportedNetwork)
+def invalidate_active_networks(sender, **kwargs):
+    """Drop the cached active-network map and /networks list when a network changes."""
+    clear_active_networks()
+    cache.delete(NETWORKS_CACHE_KEY)
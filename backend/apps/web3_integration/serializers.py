@@ -7,7 +7,10 @@ Web3 Integration Serializers for FinTech Banking API
 @created 2024-01-20
 """
 from rest_framework import serializers
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+from decimal import Decimal
 from .models import SupportedNetwork, TokenContract, WalletBalance, SmartContractInteraction, DeFiPosition
+from .utils import get_eth_price_usd
 
 class SupportedNetworkSerializer(serializers.ModelSerializer):
     """
@@ -34,6 +37,11 @@ class TokenContractSerializer(serializers.ModelSerializer):
             'name', 'symbol', 'decimals', 'total_supply',
             'current_price_usd', 'market_cap', 'price_change_24h'
         ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the network read by network_name."""
+        return queryset.select_related('network')
 
 class WalletBalanceSerializer(serializers.ModelSerializer):
     """
@@ -50,6 +58,11 @@ class WalletBalanceSerializer(serializers.ModelSerializer):
             'id', 'token', 'token_symbol', 'token_name', 'network_name',
             'wallet_address', 'balance', 'balance_usd', 'current_price', 'last_updated'
         ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the token and its network read by the nested sources."""
+        return queryset.select_related('token__network')
 
 class SmartContractInteractionSerializer(serializers.ModelSerializer):
     """
@@ -71,12 +84,26 @@ class SmartContractInteractionSerializer(serializers.ModelSerializer):
             'output_data', 'status', 'error_message', 'created_at', 'confirmed_at'
         ]
     
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the network read by network_name and multiply out gas cost in SQL."""
+        return queryset.select_related('network').annotate(
+            gas_cost_wei=ExpressionWrapper(
+                F('gas_used') * F('gas_price'), output_field=DecimalField(max_digits=40, decimal_places=0)
+            )
+        )
+    
     def get_gas_cost_usd(self, obj):
         """Calculate gas cost in USD."""
         if obj.gas_used and obj.gas_price:
-            gas_cost_eth = (obj.gas_used * obj.gas_price) / 10**18
-            eth_price_usd = 2400  # Simulated ETH price
-            return round(gas_cost_eth * eth_price_usd, 2)
+            gas_cost_wei = getattr(obj, 'gas_cost_wei', None) or obj.gas_used * obj.gas_price
+            gas_cost_eth = float(gas_cost_wei) / 10**18
+            
+            # Resolve the price once and share it with every row via the context
+            eth_price_usd = self.context.get('eth_price_usd')
+            if eth_price_usd is None:
+                eth_price_usd = self.context['eth_price_usd'] = get_eth_price_usd()
+            return round(gas_cost_eth * float(eth_price_usd), 2)
         return None
 
 class DeFiPositionSerializer(serializers.ModelSerializer):
@@ -100,4 +127,21 @@ class DeFiPositionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'id', 'profit_loss', 'profit_loss_percentage', 'created_at', 'updated_at'
-        ]
\ No newline at end of file
+        ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Join the tokens and network read by the *_symbol/network_name
+        sources, and compute profit_loss and profit_loss_percentage in SQL.
+        """
+        amount_field = DecimalField(max_digits=30, decimal_places=18)
+        profit_loss = F('amount_current') + F('rewards_earned') - F('amount_deposited')
+        return queryset.select_related('token_in', 'token_out', 'network').annotate(
+            profit_loss=ExpressionWrapper(profit_loss, output_field=amount_field),
+            profit_loss_percentage=Case(
+                When(amount_deposited=0, then=Value(Decimal('0'))),
+                default=ExpressionWrapper(profit_loss * 100 / F('amount_deposited'), output_field=amount_field),
+                output_field=amount_field,
+            ),
+        )
\ No newline at end of file
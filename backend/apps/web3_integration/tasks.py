@@ -0,0 +1,168 @@
+"""
+Web3 Background Tasks for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+from celery import shared_task
+from django.core.cache import cache
+from django.db import transaction as db_tx
+from django.utils import timezone
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+from itertools import islice
+from web3 import Web3
+from .models import SupportedNetwork, TokenContract, WalletBalance
+from .utils import get_eth_price_usd, get_token_balances, get_web3
+import logging
+
+logger = logging.getLogger(__name__)
+
+BALANCE_FETCH_WORKERS = 8  # upper bound on networks queried concurrently
+TOKEN_CHUNK_SIZE = 200  # tokens fetched and written per batch
+GAS_PRICE_WORKERS = 8  # upper bound on concurrent RPC endpoints queried
+GAS_PRICES_CACHE_KEY = 'web3:gas_prices'
+GAS_PRICES_TTL = 60  # seconds; stale prices expire if the poller stops
+
+def _fetch_network_balances(rpc_url, wallet_address, tokens):
+    """On-chain balances of ``tokens`` on one network, keyed by token id."""
+    raw_balances = get_token_balances(
+        rpc_url, wallet_address, [token.contract_address for token in tokens]
+    )
+    return {
+        token.id: Decimal(raw) / (Decimal(10) ** token.decimals)
+        for token, raw in zip(tokens, raw_balances)
+        if raw is not None
+    }
+
+def _refresh_token_chunk(user_id, wallet_address, tokens, now):
+    """Fetch and store balances for one chunk of tokens; returns rows written."""
+    tokens_by_network = defaultdict(list)
+    for token in tokens:
+        tokens_by_network[token.network.rpc_url].append(token)
+    
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=min(len(tokens_by_network), BALANCE_FETCH_WORKERS)) as executor:
+        futures = [
+            executor.submit(_fetch_network_balances, rpc_url, wallet_address, network_tokens)
+            for rpc_url, network_tokens in tokens_by_network.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                fetched.update(future.result())
+            except Exception:
+                logger.exception("Failed to fetch balances for %s", wallet_address)
+    
+    existing = {
+        balance.token_id: balance
+        for balance in WalletBalance.objects.filter(
+            user_id=user_id, wallet_address=wallet_address, token_id__in=list(fetched)
+        )
+    }
+    to_update = []
+    to_create = []
+    
+    for token in tokens:
+        if token.id not in fetched:
+            continue
+        token_balance = fetched[token.id]
+        balance_usd = token_balance * (token.current_price_usd or Decimal('1'))
+        
+        balance = existing.get(token.id)
+        if balance is None:
+            to_create.append(WalletBalance(
+                user_id=user_id,
+                token=token,
+                wallet_address=wallet_address,
+                balance=token_balance,
+                balance_usd=balance_usd
+            ))
+        else:
+            balance.balance = token_balance
+            balance.balance_usd = balance_usd
+            # auto_now is not applied by bulk_update
+            balance.last_updated = now
+            to_update.append(balance)
+    
+    with db_tx.atomic():
+        WalletBalance.objects.bulk_update(to_update, ['balance', 'balance_usd', 'last_updated'])
+        WalletBalance.objects.bulk_create(to_create)
+    
+    return len(to_update) + len(to_create)
+
+@shared_task
+def refresh_wallet_balances(user_id, wallet_address):
+    """
+    Refresh a wallet's token balances from blockchain.
+    
+    Tokens are streamed from the database in chunks of TOKEN_CHUNK_SIZE so
+    memory stays bounded however many tokens are supported. Within a chunk,
+    tokens are read with one Multicall3 eth_call per network, networks are
+    queried concurrently, and the results are written back with one bulk
+    UPDATE and one bulk INSERT. Tokens whose balance could not be read keep
+    their stored balance.
+    """
+    wallet_address = wallet_address.lower()
+    now = timezone.now()
+    
+    # Join each token's network up front so per-token reads never lazy-load it
+    tokens = TokenContract.objects.filter(is_active=True).select_related('network').only(
+        'id', 'contract_address', 'decimals', 'current_price_usd', 'network__chain_id', 'network__rpc_url'
+    ).iterator(chunk_size=TOKEN_CHUNK_SIZE)
+    
+    updated_count = 0
+    while chunk := list(islice(tokens, TOKEN_CHUNK_SIZE)):
+        updated_count += _refresh_token_chunk(user_id, wallet_address, chunk, now)
+    
+    return updated_count
+
+def _fetch_gas_price(rpc_url):
+    """Current gas price in wei reported by an RPC endpoint."""
+    return get_web3(rpc_url).eth.gas_price
+
+@shared_task
+def poll_gas_prices():
+    """
+    Refresh the cached gas prices of every active network.
+    
+    Each distinct endpoint is queried once, all endpoints concurrently, and
+    the combined result is stored under GAS_PRICES_CACHE_KEY so the gas
+    price endpoint is a single cache read.
+    """
+    gas_prices = {}
+    
+    eth_price_usd = float(get_eth_price_usd())
+    
+    networks = list(SupportedNetwork.objects.filter(is_active=True).values('name', 'chain_id', 'rpc_url'))
+    
+    rpc_urls = {network['rpc_url'] for network in networks}
+    results = {}
+    if rpc_urls:
+        with ThreadPoolExecutor(max_workers=min(len(rpc_urls), GAS_PRICE_WORKERS)) as executor:
+            futures = {executor.submit(_fetch_gas_price, rpc_url): rpc_url for rpc_url in rpc_urls}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+    
+    for network in networks:
+        gas_price = results[network['rpc_url']]
+        if isinstance(gas_price, Exception):
+            gas_prices[network['name']] = {
+                'error': str(gas_price)
+            }
+            continue
+        
+        gas_prices[network['name']] = {
+            'chain_id': network['chain_id'],
+            'gas_price_wei': gas_price,
+            'gas_price_gwei': Web3.from_wei(gas_price, 'gwei'),
+            'estimated_cost_usd': float(Web3.from_wei(gas_price * 21000, 'ether')) * eth_price_usd
+        }
+    
+    cache.set(GAS_PRICES_CACHE_KEY, gas_prices, GAS_PRICES_TTL)
+    return gas_prices
@@ -0,0 +1,141 @@
+"""
+Web3 Integration Utilities for FinTech Banking Platform
+
+@author Adam J Smith <boom.ski@hotmail.com>
+@copyright 2024 NOIR9 FOUNDATION INC. All rights reserved.
+@license Commercial License - Proprietary Software
+@created 2024-01-20
+"""
+from decimal import Decimal
+from eth_abi import decode, encode
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+import requests
+import threading
+import time
+
+ETH_PRICE_TTL = 60  # seconds
+ACTIVE_NETWORKS_TTL = 300  # seconds
+NETWORKS_CACHE_KEY = 'web3:networks'  # rendered /networks list
+NETWORKS_CACHE_TTL = 300  # seconds
+RPC_TIMEOUT = 5  # seconds
+RPC_POOL_SIZE = 32  # keep-alive connections per RPC endpoint
+
+# Multicall3 is deployed at the same address on every EVM chain
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+MULTICALL3_ABI = [{
+    'name': 'aggregate3',
+    'type': 'function',
+    'stateMutability': 'payable',
+    'inputs': [{
+        'name': 'calls',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'target', 'type': 'address'},
+            {'name': 'allowFailure', 'type': 'bool'},
+            {'name': 'callData', 'type': 'bytes'},
+        ],
+    }],
+    'outputs': [{
+        'name': 'returnData',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'success', 'type': 'bool'},
+            {'name': 'returnData', 'type': 'bytes'},
+        ],
+    }],
+}]
+BALANCE_OF_SELECTOR = bytes.fromhex('70a08231')  # balanceOf(address)
+FALLBACK_ETH_PRICE_USD = Decimal('2400')  # Simulated ETH price
+
+@lru_cache(maxsize=1)
+def _eth_price_for_bucket(bucket):
+    """Look up the ETH price once per TTL bucket."""
+    from .models import TokenContract
+    
+    price = TokenContract.objects.filter(
+        symbol__in=['ETH', 'WETH'], is_active=True, current_price_usd__isnull=False
+    ).values_list('current_price_usd', flat=True).first()
+    return price or FALLBACK_ETH_PRICE_USD
+
+@lru_cache(maxsize=1)
+def _active_networks_for_bucket(bucket):
+    """Load the active networks, keyed by chain id, once per TTL bucket."""
+    from .models import SupportedNetwork
+    
+    return {network.chain_id: network for network in SupportedNetwork.objects.filter(is_active=True)}
+
+def get_active_network(chain_id):
+    """
+    Active network for ``chain_id``, or None if it is unknown or inactive.
+    
+    Served from a per-process map that is cleared by SupportedNetwork save
+    and delete signals and otherwise rebuilt every ACTIVE_NETWORKS_TTL
+    seconds, so other processes pick up changes within that window.
+    """
+    try:
+        chain_id = int(chain_id)
+    except (TypeError, ValueError):
+        return None
+    return _active_networks_for_bucket(int(time.time() // ACTIVE_NETWORKS_TTL)).get(chain_id)
+
+def clear_active_networks():
+    """Drop this process's cached active-network map."""
+    _active_networks_for_bucket.cache_clear()
+
+def get_eth_price_usd():
+    """
+    Current ETH price in USD.
+    
+    Read from the tracked ETH/WETH token contract and memoised per process
+    for ETH_PRICE_TTL seconds, so per-row consumers never hit the database.
+    """
+    return _eth_price_for_bucket(int(time.time() // ETH_PRICE_TTL))
+
+_W3_CACHE = {}
+_W3_LOCK = threading.Lock()
+
+def get_web3(rpc_url):
+    """
+    Shared Web3 client for an RPC endpoint.
+    
+    One client is kept per URL for the life of the process, backed by a
+    pooled requests session, so calls reuse keep-alive connections instead
+    of paying a TCP and TLS handshake on every request.
+    """
+    w3 = _W3_CACHE.get(rpc_url)
+    if w3 is None:
+        with _W3_LOCK:
+            w3 = _W3_CACHE.get(rpc_url)
+            if w3 is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                w3 = Web3(Web3.HTTPProvider(
+                    rpc_url, request_kwargs={'timeout': RPC_TIMEOUT}, session=session
+                ))
+                _W3_CACHE[rpc_url] = w3
+    return w3
+
+def get_token_balances(rpc_url, wallet_address, token_addresses):
+    """
+    Raw ERC-20 balances of a wallet, in token base units.
+    
+    All balanceOf reads for the network are folded into a single Multicall3
+    aggregate3 eth_call. Entries whose call failed come back as None.
+    """
+    w3 = get_web3(rpc_url)
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    call_data = BALANCE_OF_SELECTOR + encode(['address'], [Web3.to_checksum_address(wallet_address)])
+    
+    results = multicall.functions.aggregate3([
+        (Web3.to_checksum_address(token_address), True, call_data)
+        for token_address in token_addresses
+    ]).call()
+    
+    return [
+        decode(['uint256'], return_data)[0] if success and len(return_data) >= 32 else None
+        for success, return_data in results
+    ]
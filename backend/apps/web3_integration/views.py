@@ -11,12 +11,51 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from web3 import Web3
+from celery.result import AsyncResult
+from django.core.cache import cache
+from decimal import Decimal
+import secrets
+from apps.accounts.serializers import _ETH_ADDR_RE
 from .models import SupportedNetwork, TokenContract, WalletBalance, SmartContractInteraction, DeFiPosition
 from .serializers import (
     SupportedNetworkSerializer, TokenContractSerializer, WalletBalanceSerializer,
     SmartContractInteractionSerializer, DeFiPositionSerializer
 )
+from .tasks import GAS_PRICES_CACHE_KEY, poll_gas_prices, refresh_wallet_balances
+from .utils import NETWORKS_CACHE_KEY, NETWORKS_CACHE_TTL, get_active_network, get_web3
+
+REFRESH_TASK_TTL = 3600  # seconds a refresh task id stays pollable
+
+_SEND_REQUIRED_FIELDS = frozenset({'to_address', 'amount', 'network_id'})
+_STAKE_REQUIRED_FIELDS = frozenset({'protocol_name', 'token_address', 'amount'})
+
+# Static protocol catalogue, built once at import
+_PROTOCOLS_PAYLOAD = {
+    'success': True,
+    'data': [
+        {
+            'name': 'Uniswap V3',
+            'type': 'DEX',
+            'tvl': '4.2B',
+            'apy_range': '0.1% - 500%',
+            'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI']
+        },
+        {
+            'name': 'Aave',
+            'type': 'Lending',
+            'tvl': '6.8B',
+            'apy_range': '0.5% - 15%',
+            'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI', 'WBTC']
+        },
+        {
+            'name': 'Compound',
+            'type': 'Lending',
+            'tvl': '2.1B',
+            'apy_range': '0.3% - 12%',
+            'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI']
+        }
+    ]
+}
 
 class Web3ViewSet(viewsets.ViewSet):
     """
@@ -27,12 +66,19 @@ class Web3ViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def networks(self, request):
         """Get supported blockchain networks."""
-        networks = SupportedNetwork.objects.filter(is_active=True)
-        serializer = SupportedNetworkSerializer(networks, many=True)
+        # Plain column values in the serializer's schema; the list rarely
+        # changes, so it is cached across requests
+        networks = cache.get_or_set(
+            NETWORKS_CACHE_KEY,
+            lambda: list(
+                SupportedNetwork.objects.filter(is_active=True).values(*SupportedNetworkSerializer.Meta.fields)
+            ),
+            NETWORKS_CACHE_TTL
+        )
         
         return Response({
             'success': True,
-            'data': serializer.data
+            'data': networks
         })
     
     @action(detail=False, methods=['get'])
@@ -49,13 +95,18 @@ class Web3ViewSet(viewsets.ViewSet):
                         'message': 'No wallet address provided or connected'
                     }
                 }, status=status.HTTP_400_BAD_REQUEST)
+            # Stored lowercased already
             wallet_address = request.user.wallet_address
+        else:
+            wallet_address = wallet_address.lower()
         
         # Get balances from database
-        balances = WalletBalance.objects.filter(
-            user=request.user,
-            wallet_address=wallet_address.lower()
-        ).select_related('token', 'token__network')
+        balances = WalletBalanceSerializer.setup_eager_loading(
+            WalletBalance.objects.filter(
+                user=request.user,
+                wallet_address=wallet_address
+            )
+        )
         
         serializer = WalletBalanceSerializer(balances, many=True)
         
@@ -80,16 +131,53 @@ class Web3ViewSet(viewsets.ViewSet):
                 }
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Refresh balances for all supported tokens
-        updated_balances = self._refresh_wallet_balances(request.user, wallet_address)
+        if not _ETH_ADDR_RE.match(wallet_address):
+            return Response({
+                'error': {
+                    'code': 'INVALID_WALLET_ADDRESS',
+                    'message': 'Invalid Ethereum address format'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        wallet_address = wallet_address.lower()
+        
+        # Refresh balances for all supported tokens on a background worker;
+        # the client polls refresh_status for completion
+        task = refresh_wallet_balances.delay(str(request.user.id), wallet_address)
+        cache.set(f"web3:refresh:{task.id}", str(request.user.id), REFRESH_TASK_TTL)
         
         return Response({
             'success': True,
             'data': {
-                'updated_count': len(updated_balances),
-                'wallet_address': wallet_address,
-                'last_updated': timezone.now()
+                'task_id': task.id,
+                'status': 'PENDING',
+                'wallet_address': wallet_address
             }
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path=r'refresh-status/(?P<task_id>[^/.]+)')
+    def refresh_status(self, request, task_id=None):
+        """Status of a balance refresh started by this user."""
+        if cache.get(f"web3:refresh:{task_id}") != str(request.user.id):
+            return Response({
+                'error': {
+                    'code': 'TASK_NOT_FOUND',
+                    'message': 'Refresh task not found'
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        result = AsyncResult(task_id)
+        data = {
+            'task_id': task_id,
+            'status': result.status
+        }
+        if result.successful():
+            data['updated_count'] = result.result
+        elif result.failed():
+            data['error'] = 'Balance refresh failed'
+        
+        return Response({
+            'success': True,
+            'data': data
         })
     
     @action(detail=False, methods=['post'])
@@ -98,25 +186,23 @@ class Web3ViewSet(viewsets.ViewSet):
         data = request.data
         
         # Validate required fields
-        required_fields = ['to_address', 'amount', 'network_id']
-        for field in required_fields:
-            if field not in data:
-                return Response({
-                    'error': {
-                        'code': 'MISSING_FIELD',
-                        'message': f'Field {field} is required'
-                    }
-                }, status=status.HTTP_400_BAD_REQUEST)
+        missing = _SEND_REQUIRED_FIELDS - data.keys()
+        if missing:
+            return Response({
+                'error': {
+                    'code': 'MISSING_FIELD',
+                    'message': f"Field {', '.join(sorted(missing))} is required"
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Get network
-            network = SupportedNetwork.objects.get(
-                chain_id=data['network_id'],
-                is_active=True
-            )
+            # Get network from the in-process map of active networks
+            network = get_active_network(data['network_id'])
+            if network is None:
+                raise SupportedNetwork.DoesNotExist
             
-            # Create Web3 instance
-            w3 = Web3(Web3.HTTPProvider(network.rpc_url))
+            # Shared client for the network's endpoint
+            w3 = get_web3(network.rpc_url)
             
             # Build transaction
             transaction_data = {
@@ -124,12 +210,11 @@ class Web3ViewSet(viewsets.ViewSet):
                 'value': w3.to_wei(data['amount'], 'ether'),
                 'gas': data.get('gas_limit', 21000),
                 'gasPrice': w3.to_wei(data.get('gas_price', 20), 'gwei'),
-                'nonce': w3.eth.get_transaction_count(request.user.wallet_address),
             }
             
             # For demo purposes, we'll simulate the transaction
             # In production, this would require private key signing
-            simulated_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+            simulated_hash = '0x' + secrets.token_hex(32)
             
             # Record the interaction
             interaction = SmartContractInteraction.objects.create(
@@ -167,29 +252,6 @@ class Web3ViewSet(viewsets.ViewSet):
                     'message': str(e)
                 }
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def _refresh_wallet_balances(self, user, wallet_address):
-        """Refresh balances from blockchain (simplified for demo)."""
-        # In production, this would query actual blockchain nodes
-        updated_balances = []
-        
-        tokens = TokenContract.objects.filter(is_active=True)
-        for token in tokens:
-            # Simulate balance fetching
-            simulated_balance = Decimal('1000.123456789012345678')  # Demo balance
-            
-            balance, created = WalletBalance.objects.update_or_create(
-                user=user,
-                token=token,
-                wallet_address=wallet_address.lower(),
-                defaults={
-                    'balance': simulated_balance,
-                    'balance_usd': simulated_balance * (token.current_price_usd or Decimal('1'))
-                }
-            )
-            updated_balances.append(balance)
-        
-        return updated_balances
 
 class DeFiViewSet(viewsets.ModelViewSet):
     """
@@ -199,39 +261,14 @@ class DeFiViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return DeFiPosition.objects.filter(user=self.request.user)
+        return DeFiPositionSerializer.setup_eager_loading(
+            DeFiPosition.objects.filter(user=self.request.user)
+        )
     
     @action(detail=False, methods=['get'])
     def protocols(self, request):
         """Get available DeFi protocols."""
-        protocols = [
-            {
-                'name': 'Uniswap V3',
-                'type': 'DEX',
-                'tvl': '4.2B',
-                'apy_range': '0.1% - 500%',
-                'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI']
-            },
-            {
-                'name': 'Aave',
-                'type': 'Lending',
-                'tvl': '6.8B',
-                'apy_range': '0.5% - 15%',
-                'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI', 'WBTC']
-            },
-            {
-                'name': 'Compound',
-                'type': 'Lending',
-                'tvl': '2.1B',
-                'apy_range': '0.3% - 12%',
-                'supported_tokens': ['ETH', 'USDC', 'USDT', 'DAI']
-            }
-        ]
-        
-        return Response({
-            'success': True,
-            'data': protocols
-        })
+        return Response(_PROTOCOLS_PAYLOAD)
     
     @action(detail=False, methods=['post'])
     def stake(self, request):
@@ -239,15 +276,14 @@ class DeFiViewSet(viewsets.ModelViewSet):
         data = request.data
         
         # Validate staking data
-        required_fields = ['protocol_name', 'token_address', 'amount']
-        for field in required_fields:
-            if field not in data:
-                return Response({
-                    'error': {
-                        'code': 'MISSING_FIELD',
-                        'message': f'Field {field} is required'
-                    }
-                }, status=status.HTTP_400_BAD_REQUEST)
+        missing = _STAKE_REQUIRED_FIELDS - data.keys()
+        if missing:
+            return Response({
+                'error': {
+                    'code': 'MISSING_FIELD',
+                    'message': f"Field {', '.join(sorted(missing))} is required"
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             # Get token contract
@@ -283,26 +319,12 @@ class DeFiViewSet(viewsets.ModelViewSet):
 @permission_classes([IsAuthenticated])
 def get_gas_prices(request):
     """Get current gas prices for supported networks."""
-    gas_prices = {}
-    
-    networks = SupportedNetwork.objects.filter(is_active=True)
-    for network in networks:
-        try:
-            w3 = Web3(Web3.HTTPProvider(network.rpc_url))
-            gas_price = w3.eth.gas_price
-            
-            gas_prices[network.name] = {
-                'chain_id': network.chain_id,
-                'gas_price_wei': gas_price,
-                'gas_price_gwei': w3.from_wei(gas_price, 'gwei'),
-                'estimated_cost_usd': float(w3.from_wei(gas_price * 21000, 'ether')) * 2400  # ETH price simulation
-            }
-        except Exception as e:
-            gas_prices[network.name] = {
-                'error': str(e)
-            }
+    # Kept warm by the poll_gas_prices beat task; poll inline only when cold
+    gas_prices = cache.get(GAS_PRICES_CACHE_KEY)
+    if gas_prices is None:
+        gas_prices = poll_gas_prices()
     
     return Response({
         'success': True,
         'data': gas_prices
-    })
\ No newline at end of file
+    })
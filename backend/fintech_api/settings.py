@@ -163,9 +163,31 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+    }
+}
+
 # Celery Configuration (for async tasks)
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_BEAT_SCHEDULE = {
+    'refresh-user-balance-summary': {
+        'task': 'apps.accounts.tasks.refresh_user_balance_summary',
+        'schedule': 60.0,
+    },
+    'poll-gas-prices': {
+        'task': 'apps.web3_integration.tasks.poll_gas_prices',
+        'schedule': 10.0,
+    },
+}
+CELERY_TASK_ROUTES = {
+    # Blockchain work runs on its own worker pool
+    'apps.web3_integration.tasks.*': {'queue': 'web3'},
+}
 
 # Web3 Configuration
 WEB3_PROVIDER_URL = config('WEB3_PROVIDER_URL', default='http://localhost:8545')